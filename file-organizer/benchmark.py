@@ -0,0 +1,208 @@
+# Synthetic-tree benchmark for the file organizer.
+#
+# Generates a directory tree per size under a temp directory, then times the
+# scan, classify, plan (scan + classify + destination names, i.e. preview) and
+# move phases separately. Results are printed (or written with --output) as
+# JSON so runs can be compared. The tree is freshly written, so scans run
+# against a warm page cache.
+#
+#   python benchmark.py --sizes 10000,100000 --depth 3 --fanout 8
+#   python benchmark.py --sizes 1000000 --duplicate-ratio 0.2 --duplicates
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+DEFAULT_MIX = 'jpg=3,png=1,pdf=2,txt=2,mp4=1,mp3=1,zip=1,py=2,csv=1,bin=1,=1'
+
+
+def parse_mix(value):
+    # ext=weight pairs; an empty extension makes files with no extension
+    mix = {}
+    for part in value.split(','):
+        ext, weight = part.split('=')
+        mix[ext.lstrip('.')] = float(weight)
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError('At least one extension needs a positive weight')
+    return mix
+
+
+def make_dirs(root, depth, fanout):
+    dirs = [root]
+    level = [root]
+    for d in range(depth):
+        level = [os.path.join(parent, f'd{d}_{n}') for parent in level for n in range(fanout)]
+        for path in level:
+            os.mkdir(path)
+        dirs.extend(level)
+    return dirs
+
+
+def generate_tree(root, count, args):
+    # File i goes to directory i % len(dirs). A duplicate_ratio share of the
+    # files copy an earlier file's bytes; a collision_ratio share take their
+    # name from a small shared pool, so they clash in the category folders.
+    rng = random.Random(args.seed)
+    dirs = make_dirs(root, args.depth, args.fanout)
+    extensions = list(args.mix)
+    weights = [args.mix[ext] for ext in extensions]
+    filler = rng.randbytes(args.file_size)
+    pool_size = max(1, int(count * args.collision_ratio / 10))
+
+    duplicates = collisions = 0
+    contents = []  # content id per file, so a copy of a copy shares the original's bytes
+    for i in range(count):
+        ext = rng.choices(extensions, weights)[0]
+        suffix = f'.{ext}' if ext else ''
+        if rng.random() < args.collision_ratio:
+            name = f'shared_{rng.randrange(pool_size)}{suffix}'
+            collisions += 1
+        else:
+            name = f'file_{i}{suffix}'
+        if i and rng.random() < args.duplicate_ratio:
+            source = contents[rng.randrange(i)]
+            duplicates += 1
+        else:
+            source = i
+        contents.append(source)
+        payload = (f'{source}:'.encode() + filler)[:max(args.file_size, 16)]
+        path = os.path.join(dirs[i % len(dirs)], name)
+        if os.path.exists(path):
+            # Shared name already used in this folder; keep the file count exact
+            path = os.path.join(dirs[i % len(dirs)], f'file_{i}{suffix}')
+            collisions -= 1
+        with open(path, 'wb') as f:
+            f.write(payload)
+    return {'directories': len(dirs), 'duplicates': duplicates, 'shared_names': collisions}
+
+
+def rate(count, seconds):
+    return round(count / seconds, 1) if seconds else 0
+
+
+def run_size(organizer_module, count, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep journals out of the user's cache directory
+        organizer_module.MANIFEST_DIR = os.path.join(workdir, 'cache')
+        root = os.path.join(workdir, 'tree')
+        os.mkdir(root)
+
+        start = time.perf_counter()
+        tree = generate_tree(root, count, args)
+        generate_s = time.perf_counter() - start
+
+        organizer = organizer_module.FileOrganizer(root, args.rules, args.sniff)
+        recursive = args.depth > 0
+
+        start = time.perf_counter()
+        entries = [(entry.path, entry.name) for entry in organizer.scan(recursive)]
+        scan_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        categories = {}
+        for path, name in entries:
+            category = organizer.classify(path, name) or 'unclassified'
+            categories[category] = categories.get(category, 0) + 1
+        classify_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        plan = organizer.build_plan(recursive)
+        plan_s = time.perf_counter() - start
+        renamed = sum(1 for move in plan
+                      if os.path.basename(move['dest']) != os.path.basename(move['src']))
+
+        result = {
+            'files': count,
+            **tree,
+            'generate_s': round(generate_s, 3),
+            'scan': {'seconds': round(scan_s, 3), 'files': len(entries),
+                     'files_per_s': rate(len(entries), scan_s)},
+            'classify': {'seconds': round(classify_s, 3), 'files_per_s': rate(len(entries), classify_s),
+                         'categories': dict(sorted(categories.items()))},
+            'plan': {'seconds': round(plan_s, 3), 'moves': len(plan), 'renamed': renamed,
+                     'files_per_s': rate(len(entries), plan_s)}
+        }
+
+        if args.duplicates:
+            start = time.perf_counter()
+            groups = organizer.find_duplicates(recursive, args.workers)
+            duplicates_s = time.perf_counter() - start
+            result['duplicates_scan'] = {
+                'seconds': round(duplicates_s, 3),
+                'groups': len(groups),
+                'copies': sum(len(paths) - 1 for _, paths in groups)
+            }
+
+        start = time.perf_counter()
+        moved = organizer.apply_plan(plan, args.workers, verbose=False, batch_size=args.batch_size)
+        move_s = time.perf_counter() - start
+        result['move'] = {'seconds': round(move_s, 3), 'moved': moved,
+                          'files_per_s': rate(moved, move_s)}
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='File organizer synthetic-tree benchmark')
+    parser.add_argument('--sizes', default='10000,100000',
+                        help='comma-separated file counts, e.g. 10000,100000,1000000')
+    parser.add_argument('--depth', type=int, default=2,
+                        help='folder levels below the root (0 = flat)')
+    parser.add_argument('--fanout', type=int, default=8, help='subfolders per folder')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help='extension weights, e.g. jpg=3,pdf=2,=1 (empty = no extension)')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1,
+                        help='share of files that copy an earlier file')
+    parser.add_argument('--collision-ratio', type=float, default=0.1,
+                        help='share of files named from a small shared pool')
+    parser.add_argument('--file-size', type=int, default=256, help='bytes per file')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--sniff', choices=['off', 'missing', 'all'],
+                        help='content sniffing mode for classify')
+    parser.add_argument('--rules', help='JSON rules file passed to the organizer')
+    parser.add_argument('--duplicates', action='store_true',
+                        help='also time duplicate detection before moving')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON results to this file')
+    args = parser.parse_args()
+    args.fanout = max(1, args.fanout)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import organizer
+
+    report = {
+        'config': {
+            'depth': args.depth,
+            'fanout': args.fanout,
+            'mix': args.mix,
+            'duplicate_ratio': args.duplicate_ratio,
+            'collision_ratio': args.collision_ratio,
+            'file_size': args.file_size,
+            'workers': args.workers,
+            'sniff': args.sniff or 'off',
+            'rules': args.rules,
+            'seed': args.seed
+        },
+        'results': []
+    }
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        result = run_size(organizer, size, args)
+        report['results'].append(result)
+        print(f"files={size} scan={result['scan']['files_per_s']}/s "
+              f"classify={result['classify']['files_per_s']}/s "
+              f"move={result['move']['files_per_s']}/s", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,198 @@
+import argparse
+import errno
+import hashlib
+import json
+import mmap
 import os
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Bytes read from each end of a file for the cheap duplicate pre-check
+PARTIAL_HASH_BYTES = 4096
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Manifests live outside the organized folder; writing one inside would
+# change the folder's mtime and defeat the unchanged-folder check
+MANIFEST_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'file-organizer')
+RACY_MTIME_NS = 2 * 10**9
+
+# Content sniffing reads at most this many bytes from the start of a file
+SNIFF_BYTES = 512
+
+# (offset, signature, category) magic numbers for common formats
+MAGIC_SIGNATURES = [
+    (0, b'\x89PNG\r\n\x1a\n', 'Images'),
+    (0, b'\xff\xd8\xff', 'Images'),
+    (0, b'GIF87a', 'Images'),
+    (0, b'GIF89a', 'Images'),
+    (0, b'BM', 'Images'),
+    (8, b'WEBP', 'Images'),
+    (0, b'%PDF-', 'Documents'),
+    (0, b'{\\rtf', 'Documents'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'Documents'),
+    (4, b'ftyp', 'Videos'),
+    (0, b'\x1a\x45\xdf\xa3', 'Videos'),
+    (8, b'AVI ', 'Videos'),
+    (0, b'FLV\x01', 'Videos'),
+    (0, b'ID3', 'Audio'),
+    (0, b'\xff\xfb', 'Audio'),
+    (0, b'fLaC', 'Audio'),
+    (0, b'OggS', 'Audio'),
+    (8, b'WAVE', 'Audio'),
+    (0, b'PK\x03\x04', 'Archives'),
+    (0, b'Rar!\x1a\x07', 'Archives'),
+    (0, b"7z\xbc\xaf'\x1c", 'Archives'),
+    (0, b'\x1f\x8b\x08', 'Archives'),
+    (0, b'BZh', 'Archives'),
+    (257, b'ustar', 'Archives'),
+]
+
+# Signatures that only classify files whose extension is missing or
+# unknown, even with sniff='all'. ZIP and OLE are containers for many
+# formats (.docx, .xlsx, .odt, .xls, ...), so the extension knows better;
+# the short ones also turn up at the start of ordinary text.
+WEAK_SIGNATURES = {
+    (0, b'PK\x03\x04'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'),
+    (0, b'BM'),
+    (0, b'\xff\xfb'),
+    (0, b'\x1f\x8b\x08'),
+    (0, b'BZh'),
+}
+
+class ScanManifest:
+    # Remembers what earlier runs saw so repeat runs only touch what is new.
+    # Directories are stored with their mtime and subfolders: an unchanged
+    # mtime means no entries were added, removed or renamed, so the listing
+    # is skipped. Files that were left in place are stored as
+    # [inode, size, mtime_ns, category] and skipped while all three match
+    # whenever their folder is listed. Folders holding a file that was
+    # deferred this pass (still being written) are never recorded, so the
+    # next pass lists them again. At the end of a full scan, records for
+    # files gone from a listed folder and for folders no longer reached are
+    # dropped.
+    
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.lock = threading.Lock()
+        self.dirs = {}
+        self.files = {}
+        self.deferred = set()
+        self.visited = set()
+        self.listed = set()
+        self.listed_files = set()
+        self.dirty = False
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            # Rules or scan mode changed: start from scratch
+            if data.get('fingerprint') == fingerprint:
+                self.dirs = data.get('dirs', {})
+                self.files = data.get('files', {})
+        except (OSError, ValueError):
+            pass
+    
+    def unchanged_dir(self, path, mtime_ns):
+        with self.lock:
+            known = self.dirs.get(path)
+            if known and known['mtime_ns'] == mtime_ns:
+                return known['subdirs']
+        return None
+    
+    def start_pass(self):
+        with self.lock:
+            self.deferred.clear()
+            self.visited.clear()
+            self.listed.clear()
+            self.listed_files.clear()
+    
+    def visit_dir(self, path):
+        with self.lock:
+            self.visited.add(path)
+    
+    def listed_dir(self, path, file_paths):
+        with self.lock:
+            self.listed.add(path)
+            self.listed_files.update(file_paths)
+    
+    def finish_scan(self):
+        # Every existing folder is visited on each full scan, listed or not
+        with self.lock:
+            for path in [path for path in self.dirs if path not in self.visited]:
+                del self.dirs[path]
+                self.dirty = True
+            for path in list(self.files):
+                directory = os.path.dirname(path)
+                if (directory not in self.visited
+                        or (directory in self.listed and path not in self.listed_files)):
+                    del self.files[path]
+                    self.dirty = True
+    
+    def record_dir(self, path, mtime_ns, subdirs):
+        with self.lock:
+            if path in self.deferred:
+                return
+            record = {'mtime_ns': mtime_ns, 'subdirs': subdirs}
+            if self.dirs.get(path) != record:
+                self.dirs[path] = record
+                self.dirty = True
+    
+    def invalidate_dir(self, path):
+        with self.lock:
+            self.deferred.add(path)
+            if self.dirs.pop(path, None) is not None:
+                self.dirty = True
+    
+    def seen_file(self, entry):
+        # DirEntry.inode() comes from the directory listing; only files we
+        # have a record for pay for a stat
+        with self.lock:
+            known = self.files.get(entry.path)
+        if known is None or known[0] != entry.inode() or known[3] is not None:
+            return False
+        try:
+            stat = entry.stat()
+        except OSError:
+            return False
+        return known[1] == stat.st_size and known[2] == stat.st_mtime_ns
+    
+    def record_file(self, path, stat, category):
+        with self.lock:
+            record = [stat.st_ino, stat.st_size, stat.st_mtime_ns, category]
+            if self.files.get(path) != record:
+                self.files[path] = record
+                self.dirty = True
+    
+    def forget_file(self, path):
+        with self.lock:
+            if self.files.pop(path, None) is not None:
+                self.dirty = True
+    
+    def save(self):
+        # Only written when something changed since the last save
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {'fingerprint': self.fingerprint, 'dirs': self.dirs, 'files': self.files}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
 class FileOrganizer:
-    def __init__(self, source_dir):
+    def __init__(self, source_dir, rules_file=None, sniff=None):
+        # sniff: 'off', 'missing' (only files whose extension is missing or
+        # unknown) or 'all' (content wins over the extension when it matches).
+        # None keeps the rules file's setting, or 'off'.
         self.source_dir = Path(source_dir)
+        self.sniff_mode = 'off'
+        self.magic_signatures = list(MAGIC_SIGNATURES)
+        self.weak_signatures = set(WEAK_SIGNATURES)
         self.file_types = {
             'Images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp'],
             'Documents': ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt'],
@@ -14,60 +202,521 @@ class FileOrganizer:
             'Code': ['.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.php'],
             'Spreadsheets': ['.xls', '.xlsx', '.csv', '.ods']
         }
+        if rules_file:
+            self.load_rules(rules_file)
+        if sniff is not None:
+            self.sniff_mode = sniff
+        self.compile_rules()
+        # Names already present in each category folder, listed once per run
+        self._dest_names = {}
+        self._dest_lock = threading.Lock()
+    
+    def scan(self, recursive=False, include_categories=False, manifest=None):
+        # Yields an os.DirEntry for every file. os.scandir hands back the
+        # entry types, so no extra stat is needed per file. Category folders
+        # at the top level are skipped when recursing unless asked for.
+        # With a manifest, unchanged folders and already seen files are
+        # skipped.
+        stack = [str(self.source_dir)]
+        while stack:
+            directory = stack.pop()
+            try:
+                if manifest is not None:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                    manifest.visit_dir(directory)
+                    known_subdirs = manifest.unchanged_dir(directory, mtime_ns)
+                    if known_subdirs is not None:
+                        stack.extend(known_subdirs)
+                        continue
+                
+                subdirs = []
+                file_paths = []
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            file_paths.append(entry.path)
+                            if manifest is None or not manifest.seen_file(entry):
+                                yield entry
+                        elif recursive and entry.is_dir(follow_symlinks=False):
+                            if (not include_categories and directory == str(self.source_dir)
+                                    and entry.name in self.file_types):
+                                continue
+                            subdirs.append(entry.path)
+                stack.extend(subdirs)
+                if manifest is not None:
+                    manifest.listed_dir(directory, file_paths)
+                # A folder modified within the last couple of seconds may
+                # change again without its mtime moving (coarse timestamps),
+                # so it is only trusted once it has been quiet for a while
+                if manifest is not None and mtime_ns < time.time_ns() - RACY_MTIME_NS:
+                    manifest.record_dir(directory, mtime_ns, subdirs)
+            except OSError as e:
+                print(f"Error scanning {directory}: {e}")
+        if manifest is not None:
+            manifest.finish_scan()
+    
+    def _reserve_destination(self, category, name):
+        # Picks a free name in the category folder against a cached listing
+        # instead of stat-ing candidate paths one by one
+        dest_dir = self.source_dir / category
+        with self._dest_lock:
+            names = self._dest_names.get(category)
+            if names is None:
+                names = set(os.listdir(dest_dir)) if dest_dir.is_dir() else set()
+                self._dest_names[category] = names
+            
+            candidate = name
+            stem, ext = os.path.splitext(name)
+            counter = 1
+            while candidate in names:
+                candidate = f"{stem}_{counter}{ext}"
+                counter += 1
+            names.add(candidate)
+        return str(dest_dir / candidate)
+    
+    def _move(self, src, dest):
+        # rename() is a metadata-only move on the same filesystem; fall back
+        # to a copy + delete across devices
+        try:
+            os.rename(src, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(src, dest)
+    
+    def open_manifest(self, recursive):
+        fingerprint = hashlib.sha1(
+            json.dumps([self.file_types, self.sniff_mode,
+                        [[o, sig.hex(), c] for o, sig, c in self.magic_signatures],
+                        sorted([o, sig.hex()] for o, sig in self.weak_signatures), recursive],
+                       sort_keys=True).encode()
+        ).hexdigest()
+        os.makedirs(MANIFEST_DIR, exist_ok=True)
+        return ScanManifest(os.path.join(MANIFEST_DIR, f'{self._source_key()}.json'), fingerprint)
+    
+    def _source_key(self):
+        return hashlib.sha1(str(self.source_dir.resolve()).encode()).hexdigest()
+    
+    def journal_path(self):
+        os.makedirs(MANIFEST_DIR, exist_ok=True)
+        return os.path.join(MANIFEST_DIR, f'{self._source_key()}.journal')
     
-    def organize(self):
+    def build_plan(self, recursive=False, manifest=None, min_age=0):
+        # One scan + classify pass producing the list of moves that preview
+        # shows and apply executes: [{'src', 'dest', 'category'}, ...].
+        # Destination names are resolved here, so the plan is exact.
+        self._dest_names = {}
+        plan = []
+        newest_allowed = time.time() - min_age
+        if manifest is not None:
+            manifest.start_pass()
+        
+        for entry in self.scan(recursive, manifest=manifest):
+            category = self.classify(entry.path, entry.name)
+            
+            if manifest is not None or min_age:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if min_age and stat.st_mtime > newest_allowed:
+                    # Rescan this folder next time even if it is unchanged
+                    if manifest is not None:
+                        manifest.invalidate_dir(os.path.dirname(entry.path))
+                    continue
+                if manifest is not None:
+                    if category:
+                        manifest.forget_file(entry.path)
+                    else:
+                        manifest.record_file(entry.path, stat, None)
+            
+            if category:
+                plan.append({
+                    'src': entry.path,
+                    'dest': self._reserve_destination(category, entry.name),
+                    'category': category
+                })
+        return plan
+    
+    @staticmethod
+    def export_plan(plan, path):
+        with open(path, 'w') as f:
+            json.dump({'version': 1, 'moves': plan}, f, indent=1)
+    
+    @staticmethod
+    def load_plan(path):
+        with open(path, 'r') as f:
+            return json.load(f)['moves']
+    
+    def _apply_move(self, move, verbose):
+        # lexists: a symlink is moved as a link, even when its target has
+        # already been moved elsewhere in this run
+        src, dest = move['src'], move['dest']
+        if not os.path.lexists(src):
+            if os.path.lexists(dest):
+                return True  # already moved by an earlier, interrupted run
+            print(f"Error moving {os.path.basename(src)}: file no longer exists")
+            return False
+        if os.path.lexists(dest):
+            # Something claimed the name since the plan was built
+            stem, ext = os.path.splitext(dest)
+            counter = 1
+            while os.path.lexists(f"{stem}_{counter}{ext}"):
+                counter += 1
+            dest = move['dest'] = f"{stem}_{counter}{ext}"
+        try:
+            self._move(src, dest)
+            if verbose:
+                print(f"Moved: {os.path.basename(src)} -> {move['category']}/")
+            return True
+        except Exception as e:
+            print(f"Error moving {os.path.basename(src)}: {e}")
+            return False
+    
+    def apply_plan(self, plan, workers=8, verbose=True, batch_size=1000, max_batches=None,
+                   done=None):
+        # Executes a plan in batches. Every move is recorded in an append-only
+        # journal (the plan first, then one line per finished move) so an
+        # interrupted run can be resumed or undone. max_batches stops early;
+        # resume() picks up the rest. done: indexes finished by an earlier run.
+        journal_path = self.journal_path()
+        if done is None:
+            done = {}
+            # On disk before the first move, so any move can be resumed or undone
+            with open(journal_path, 'w') as journal:
+                journal.write(json.dumps({'plan': plan}) + '\n')
+                journal.flush()
+                os.fsync(journal.fileno())
+        else:
+            self._end_torn_line(journal_path)
+        
+        remaining = [i for i in range(len(plan)) if i not in done]
+        for dest_dir in {os.path.dirname(plan[i]['dest']) for i in remaining}:
+            os.makedirs(dest_dir, exist_ok=True)
+        
+        moved = 0
+        batches = 0
+        with open(journal_path, 'a') as journal, ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch_start in range(0, len(remaining), batch_size):
+                if max_batches is not None and batches >= max_batches:
+                    return moved
+                batch = remaining[batch_start:batch_start + batch_size]
+                results = pool.map(lambda i: self._apply_move(plan[i], verbose), batch)
+                for index, ok in zip(batch, results):
+                    if ok:
+                        moved += 1
+                        journal.write(json.dumps({'done': index, 'dest': plan[index]['dest']}) + '\n')
+                journal.flush()
+                os.fsync(journal.fileno())
+                batches += 1
+            journal.write(json.dumps({'complete': True}) + '\n')
+        return moved
+    
+    @staticmethod
+    def read_journal(journal_path):
+        # Returns (plan, {index: dest} of finished moves, complete, undone)
+        plan, done, complete, undone = None, {}, False, False
+        with open(journal_path, 'r') as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn line from a crash
+                if 'plan' in record:
+                    plan = record['plan']
+                elif 'done' in record:
+                    done[record['done']] = record['dest']
+                elif 'complete' in record:
+                    complete = True
+                elif 'undone' in record:
+                    undone = True
+        return plan, done, complete, undone
+    
+    @staticmethod
+    def _end_torn_line(journal_path):
+        # A crash can leave half a line; start appending on a fresh one
+        with open(journal_path, 'rb+') as journal:
+            if journal.seek(0, os.SEEK_END) == 0:
+                return
+            journal.seek(-1, os.SEEK_END)
+            if journal.read(1) != b'\n':
+                journal.write(b'\n')
+    
+    def resume(self, workers=8, verbose=True):
+        journal_path = self.journal_path()
+        if not os.path.exists(journal_path):
+            print("Nothing to resume.")
+            return 0
+        plan, done, complete, undone = self.read_journal(journal_path)
+        if plan is None or complete or undone:
+            print("The last run finished; nothing to resume.")
+            return 0
+        
+        for index, dest in done.items():
+            plan[index]['dest'] = dest
+        moved = self.apply_plan(plan, workers, verbose, done=done)
+        print(f"\nResume complete! Moved {moved} more files.")
+        return moved
+    
+    def undo(self, verbose=True):
+        # Moves every journaled file back to where it came from
+        journal_path = self.journal_path()
+        if not os.path.exists(journal_path):
+            print("Nothing to undo.")
+            return 0
+        plan, done, _, undone = self.read_journal(journal_path)
+        if plan is None or undone:
+            print("Nothing to undo.")
+            return 0
+        
+        restored = 0
+        for index in sorted(done, reverse=True):
+            src, dest = plan[index]['src'], done[index]
+            if os.path.lexists(src):
+                # rename() would silently replace whatever is there now
+                print(f"Not restoring {os.path.basename(src)}: {src} already exists")
+                continue
+            try:
+                os.makedirs(os.path.dirname(src), exist_ok=True)
+                self._move(dest, src)
+                restored += 1
+                if verbose:
+                    print(f"Restored: {os.path.basename(src)}")
+            except OSError as e:
+                print(f"Error restoring {os.path.basename(src)}: {e}")
+        self._end_torn_line(journal_path)
+        with open(journal_path, 'a') as journal:
+            journal.write(json.dumps({'undone': True}) + '\n')
+        print(f"\nUndo complete! Restored {restored} files.")
+        return restored
+    
+    def organize(self, recursive=False, workers=8, verbose=True, incremental=False,
+                 min_age=0, summary=True, plan=None, manifest=None):
+        # incremental: only look at what changed since the last incremental
+        # run. min_age: leave files modified less than this many seconds ago
+        # (still being written) for a later run. plan: apply a plan built
+        # earlier (e.g. by preview) instead of scanning again. manifest: an
+        # already open manifest to reuse (watch keeps one across passes).
+        if not self.source_dir.exists():
+            print(f"Source directory '{self.source_dir}' does not exist!")
+            return 0
+        
+        if incremental and manifest is None:
+            manifest = self.open_manifest(recursive)
+        if plan is None:
+            plan = self.build_plan(recursive, manifest, min_age)
+        organized_count = self.apply_plan(plan, workers, verbose) if plan else 0
+        
+        # Saved only after the moves, so a crash never marks folders as done
+        if manifest is not None:
+            manifest.save()
+        if summary:
+            print(f"\nOrganization complete! Moved {organized_count} files.")
+        return organized_count
+    
+    def watch(self, interval=5.0, recursive=False, settle=2.0, workers=4):
+        # Polls with incremental runs. The manifest stays in memory and is
+        # only written when a pass changed it, so when nothing changed a pass
+        # costs one stat per folder.
+        print(f"Watching '{self.source_dir}' every {interval}s (Ctrl+C to stop)...")
+        manifest = self.open_manifest(recursive)
+        try:
+            while True:
+                moved = self.organize(recursive, workers, verbose=True, incremental=True,
+                                      min_age=settle, summary=False, manifest=manifest)
+                if moved:
+                    print(f"Moved {moved} new files.")
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+    
+    @staticmethod
+    def _partial_hash(path, size):
+        digest = hashlib.blake2b()
+        with open(path, 'rb') as f:
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+            if size > PARTIAL_HASH_BYTES:
+                f.seek(max(PARTIAL_HASH_BYTES, size - PARTIAL_HASH_BYTES))
+                digest.update(f.read(PARTIAL_HASH_BYTES))
+        return digest.digest()
+    
+    @staticmethod
+    def _full_hash(path, size):
+        # mmap avoids copying the file through Python buffers; hashlib
+        # releases the GIL on large updates so threads hash in parallel
+        digest = hashlib.blake2b()
+        with open(path, 'rb') as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with memoryview(mapped) as view:
+                        for offset in range(0, len(view), HASH_BUFFER_SIZE):
+                            digest.update(view[offset:offset + HASH_BUFFER_SIZE])
+            except (ValueError, OSError):
+                for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+                    digest.update(chunk)
+        return digest.digest()
+    
+    def _refine(self, groups, hash_func, workers):
+        # Splits each group of same-size candidates by hash_func, dropping
+        # files that turn out to be unique. Every file of every group is
+        # queued at once; most groups hold two files, so hashing group by
+        # group would leave most workers idle.
+        jobs = [(index, size, path) for index, (size, paths) in enumerate(groups) for path in paths]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hashes = list(pool.map(lambda job: self._safe_hash(hash_func, job[2], job[1]), jobs))
+        
+        by_hash = {}
+        for (index, size, path), digest in zip(jobs, hashes):
+            if digest is not None:
+                by_hash.setdefault((index, digest), (size, []))[1].append(path)
+        return [(size, same) for size, same in by_hash.values() if len(same) > 1]
+    
+    @staticmethod
+    def _safe_hash(hash_func, path, size):
+        try:
+            return hash_func(path, size)
+        except OSError as e:
+            print(f"Error reading {path}: {e}")
+            return None
+    
+    def find_duplicates(self, recursive=True, workers=8):
+        # Staged filtering: group by size, then by a hash of the first and
+        # last few KB, and only fully hash what still matches. Returns
+        # (size, [paths]) groups of byte-identical files.
+        by_size = {}
+        seen_inodes = set()
+        for entry in self.scan(recursive, include_categories=True):
+            if entry.is_symlink():
+                continue  # removing or relinking a symlink never frees its target
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if stat.st_size == 0 or (stat.st_dev, stat.st_ino) in seen_inodes:
+                continue  # empty files and existing hard links are skipped
+            seen_inodes.add((stat.st_dev, stat.st_ino))
+            by_size.setdefault(stat.st_size, []).append(entry.path)
+        
+        groups = [(size, sorted(paths)) for size, paths in by_size.items() if len(paths) > 1]
+        groups = self._refine(groups, self._partial_hash, workers)
+        groups = self._refine(groups, self._full_hash, workers)
+        return groups
+    
+    def dedupe(self, action='report', recursive=True, workers=8):
+        # action: 'report', 'hardlink' (replace copies with links to the
+        # first file) or 'remove' (delete the copies)
         if not self.source_dir.exists():
             print(f"Source directory '{self.source_dir}' does not exist!")
             return
         
-        organized_count = 0
-        
-        for file_path in self.source_dir.iterdir():
-            if file_path.is_file():
-                category = self.get_file_category(file_path.suffix.lower())
-                if category:
-                    dest_dir = self.source_dir / category
-                    dest_dir.mkdir(exist_ok=True)
-                    
-                    dest_path = dest_dir / file_path.name
-                    
-                    # Handle duplicate names
-                    counter = 1
-                    while dest_path.exists():
-                        name = file_path.stem
-                        ext = file_path.suffix
-                        dest_path = dest_dir / f"{name}_{counter}{ext}"
-                        counter += 1
-                    
-                    try:
-                        shutil.move(str(file_path), str(dest_path))
-                        print(f"Moved: {file_path.name} -> {category}/")
-                        organized_count += 1
-                    except Exception as e:
-                        print(f"Error moving {file_path.name}: {e}")
-        
-        print(f"\nOrganization complete! Moved {organized_count} files.")
+        groups = self.find_duplicates(recursive, workers)
+        reclaimed = 0
+        duplicate_count = 0
+        for size, paths in groups:
+            keep, copies = paths[0], paths[1:]
+            print(f"\n{len(copies)} duplicate(s) of {keep} ({size} bytes):")
+            for copy in copies:
+                try:
+                    if action == 'hardlink':
+                        tmp_path = copy + '.dedupe-tmp'
+                        os.link(keep, tmp_path)
+                        os.replace(tmp_path, copy)
+                    elif action == 'remove':
+                        os.remove(copy)
+                    print(f"  - {copy}")
+                    reclaimed += size
+                    duplicate_count += 1
+                except OSError as e:
+                    print(f"  ! {copy}: {e}")
+        
+        verb = {'report': 'Reclaimable', 'hardlink': 'Reclaimed', 'remove': 'Reclaimed'}[action]
+        print(f"\nFound {duplicate_count} duplicate files. {verb}: {reclaimed} bytes.")
     
-    def get_file_category(self, extension):
+    def load_rules(self, rules_file):
+        # JSON rules, e.g.
+        # {"categories": {"Ebooks": [".epub", ".mobi"]}, "replace": false,
+        #  "magic": [{"category": "Ebooks", "offset": 60, "hex": "424f4f4b4d4f4249"}],
+        #  "sniff": "missing"}
+        # A magic rule with "weak": true never overrides a known extension.
+        with open(rules_file, 'r') as f:
+            rules = json.load(f)
+        if rules.get('replace'):
+            self.file_types = {}
+            self.magic_signatures = []
+            self.weak_signatures = set()
+        for category, extensions in rules.get('categories', {}).items():
+            merged = self.file_types.setdefault(category, [])
+            for ext in extensions:
+                ext = ext.lower() if ext.startswith('.') else '.' + ext.lower()
+                if ext not in merged:
+                    merged.append(ext)
+        for rule in rules.get('magic', []):
+            offset, signature = int(rule.get('offset', 0)), bytes.fromhex(rule['hex'])
+            self.magic_signatures.append((offset, signature, rule['category']))
+            if rule.get('weak'):
+                self.weak_signatures.add((offset, signature))
+        self.sniff_mode = rules.get('sniff', self.sniff_mode)
+    
+    def compile_rules(self):
+        # Extension -> category index; the first category listing an
+        # extension wins, as with the old linear search. Magic signatures
+        # are grouped by offset, longest first, so more specific ones match
+        # before shorter prefixes. Each carries whether it may override the
+        # extension.
+        self.extension_index = {}
         for category, extensions in self.file_types.items():
-            if extension in extensions:
-                return category
-        return None
+            for extension in extensions:
+                self.extension_index.setdefault(extension, category)
+        
+        by_offset = {}
+        for offset, signature, category in self.magic_signatures:
+            by_offset.setdefault(offset, []).append(
+                (signature, category, (offset, signature) not in self.weak_signatures))
+        self.compiled_magic = [
+            (offset, sorted(signatures, key=lambda s: -len(s[0])))
+            for offset, signatures in sorted(by_offset.items())
+        ]
+        self.sniff_bytes = max([SNIFF_BYTES] + [offset + len(signature)
+                                                for offset, signature, _ in self.magic_signatures])
+    
+    def sniff(self, path):
+        # Returns (category, decisive) for the first matching signature
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(self.sniff_bytes)
+        except OSError:
+            return None, False
+        for offset, signatures in self.compiled_magic:
+            for signature, category, decisive in signatures:
+                if header.startswith(signature, offset):
+                    return category, decisive
+        return None, False
+    
+    def classify(self, path, name):
+        category = self.extension_index.get(os.path.splitext(name)[1].lower())
+        if self.sniff_mode == 'all' or (self.sniff_mode == 'missing' and category is None):
+            # Content only overrides a known extension on a decisive match
+            sniffed, decisive = self.sniff(path)
+            if sniffed and (category is None or decisive):
+                category = sniffed
+        return category
+    
+    def get_file_category(self, extension):
+        return self.extension_index.get(extension)
     
-    def preview_organization(self):
+    def preview_organization(self, recursive=False):
+        # Returns the plan so it can be applied without scanning again
         if not self.source_dir.exists():
             print(f"Source directory '{self.source_dir}' does not exist!")
-            return
+            return None
         
+        plan = self.build_plan(recursive)
         categories = {}
         
-        for file_path in self.source_dir.iterdir():
-            if file_path.is_file():
-                category = self.get_file_category(file_path.suffix.lower())
-                if category:
-                    if category not in categories:
-                        categories[category] = []
-                    categories[category].append(file_path.name)
+        for move in plan:
+            if move['category'] not in categories:
+                categories[move['category']] = []
+            categories[move['category']].append(os.path.basename(move['src']))
         
         print("Preview of organization:")
         print("-" * 40)
@@ -77,8 +726,15 @@ class FileOrganizer:
                 print(f"  - {file}")
             if len(files) > 5:
                 print(f"  ... and {len(files) - 5} more")
+        return plan
 
 def main():
+    parser = argparse.ArgumentParser(description='Organize files into folders by type')
+    parser.add_argument('--rules', help='JSON file with extra categories and magic numbers')
+    parser.add_argument('--sniff', choices=['off', 'missing', 'all'],
+                        help='detect file types from content (first 512 bytes)')
+    args = parser.parse_args()
+    
     print("File Organizer")
     print("=" * 30)
     
@@ -86,25 +742,71 @@ def main():
     if not source:
         source = "."  # Current directory
     
-    organizer = FileOrganizer(source)
+    organizer = FileOrganizer(source, args.rules, args.sniff)
+    plan = None  # from the last preview, applied by option 2
     
     while True:
         print("\nOptions:")
         print("1. Preview organization")
         print("2. Organize files")
-        print("3. Exit")
+        print("3. Organize files recursively (includes subfolders)")
+        print("4. Find duplicate files")
+        print("5. Organize new files only (incremental)")
+        print("6. Watch folder and organize new files")
+        print("7. Resume interrupted organization")
+        print("8. Undo last organization")
+        print("9. Export plan to file")
+        print("10. Apply plan from file")
+        print("11. Exit")
         
-        choice = input("\nEnter your choice (1-3): ").strip()
+        choice = input("\nEnter your choice (1-11): ").strip()
         
         if choice == '1':
-            organizer.preview_organization()
-        elif choice == '2':
+            plan = organizer.preview_organization()
+        elif choice in ('2', '3'):
             confirm = input("Are you sure you want to organize files? (y/N): ")
             if confirm.lower() == 'y':
-                organizer.organize()
+                organizer.organize(recursive=(choice == '3'),
+                                   plan=plan if choice == '2' else None)
+                plan = None
             else:
                 print("Organization cancelled.")
-        elif choice == '3':
+        elif choice == '4':
+            action = input("Action - report, hardlink or remove (default report): ").strip().lower()
+            if action in ('hardlink', 'remove'):
+                confirm = input(f"Are you sure you want to {action} duplicates? (y/N): ")
+                if confirm.lower() != 'y':
+                    print("Deduplication cancelled.")
+                    continue
+            elif action != 'report':
+                action = 'report'
+            organizer.dedupe(action)
+        elif choice == '5':
+            organizer.organize(incremental=True)
+        elif choice == '6':
+            organizer.watch()
+        elif choice == '7':
+            organizer.resume()
+        elif choice == '8':
+            confirm = input("Move files back to where they were? (y/N): ")
+            if confirm.lower() == 'y':
+                organizer.undo()
+        elif choice == '9':
+            path = input("Export plan to (default plan.json): ").strip() or 'plan.json'
+            export = organizer.build_plan(recursive=input("Include subfolders? (y/N): ").lower() == 'y')
+            organizer.export_plan(export, path)
+            print(f"Wrote {len(export)} moves to {path}")
+        elif choice == '10':
+            path = input("Plan file: ").strip()
+            batch_size = input("Moves per batch (default 1000): ").strip()
+            try:
+                loaded = organizer.load_plan(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not read plan: {e}")
+                continue
+            moved = organizer.apply_plan(loaded, batch_size=int(batch_size or 1000))
+            print(f"\nOrganization complete! Moved {moved} files.")
+        elif choice == '11':
             print("Goodbye!")
             break
         else:
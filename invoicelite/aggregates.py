@@ -0,0 +1,114 @@
+import math
+import threading
+
+
+def _bucket():
+    return {'count': 0, 'revenue': 0.0}
+
+
+class InvoiceAggregates:
+    # Running totals kept per month, per client and per status, updated on
+    # every create/edit/delete so analytics never scans the invoice list.
+    # `cells` holds the (month, client, status) cross product and answers
+    # filtered queries in time proportional to the number of cells.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = _bucket()
+        self.by_month = {}
+        self.by_client = {}
+        self.by_status = {}
+        self.cells = {}
+
+    @staticmethod
+    def _keys(invoice):
+        return invoice['date'][:7], str(invoice['client_id']), invoice['status']
+
+    def _apply(self, invoice, sign):
+        # Keys and amount are worked out before any bucket changes. A NaN
+        # or inf would stay in every sum it touched, even after removal.
+        month, client_id, status = self._keys(invoice)
+        if not math.isfinite(invoice['total']):
+            raise ValueError(f"invoice {invoice.get('id')}: total is not a finite number")
+        amount = invoice['total'] * sign
+        for table, key in ((self.by_month, month), (self.by_client, client_id),
+                           (self.by_status, status), (self.cells, (month, client_id, status))):
+            bucket = table.setdefault(key, _bucket())
+            bucket['count'] += sign
+            bucket['revenue'] += amount
+            if bucket['count'] == 0:
+                del table[key]
+        self.total['count'] += sign
+        self.total['revenue'] += amount
+
+    def add(self, invoice):
+        with self.lock:
+            self._apply(invoice, 1)
+
+    def add_many(self, invoices):
+        # All or nothing, like InvoiceStore.add_many
+        with self.lock:
+            applied = []
+            try:
+                for invoice in invoices:
+                    self._apply(invoice, 1)
+                    applied.append(invoice)
+            except Exception:
+                for invoice in applied:
+                    self._apply(invoice, -1)
+                raise
+
+    def remove(self, invoice):
+        with self.lock:
+            self._apply(invoice, -1)
+
+    def update(self, old_invoice, new_invoice):
+        with self.lock:
+            self._apply(old_invoice, -1)
+            try:
+                self._apply(new_invoice, 1)
+            except Exception:
+                self._apply(old_invoice, 1)
+                raise
+
+    def summary(self, month_from=None, month_to=None, client_id=None, status=None):
+        with self.lock:
+            if month_from is None and month_to is None and client_id is None and status is None:
+                total = dict(self.total)
+                monthly = {month: dict(b) for month, b in self.by_month.items()}
+            else:
+                total = _bucket()
+                monthly = {}
+                for (month, cell_client, cell_status), b in self.cells.items():
+                    if month_from and month < month_from:
+                        continue
+                    if month_to and month > month_to:
+                        continue
+                    if client_id is not None and cell_client != str(client_id):
+                        continue
+                    if status is not None and cell_status != status:
+                        continue
+                    total['count'] += b['count']
+                    total['revenue'] += b['revenue']
+                    month_bucket = monthly.setdefault(month, _bucket())
+                    month_bucket['count'] += b['count']
+                    month_bucket['revenue'] += b['revenue']
+
+        for bucket in monthly.values():
+            bucket['revenue'] = round(bucket['revenue'], 2)
+        average = total['revenue'] / total['count'] if total['count'] > 0 else 0
+        return {
+            'total_invoices': total['count'],
+            'total_revenue': round(total['revenue'], 2),
+            'average_invoice': round(average, 2),
+            'monthly_data': monthly
+        }
+
+    def breakdown(self):
+        with self.lock:
+            return {
+                'by_client': {k: {'count': b['count'], 'revenue': round(b['revenue'], 2)}
+                              for k, b in self.by_client.items()},
+                'by_status': {k: {'count': b['count'], 'revenue': round(b['revenue'], 2)}
+                              for k, b in self.by_status.items()}
+            }
@@ -1,20 +1,88 @@
-from flask import Flask, render_template, request, jsonify, send_file
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
+from flask import Flask, Response, g, render_template, request, jsonify, send_file, stream_with_context
+from concurrent.futures import ProcessPoolExecutor
+import atexit
+import csv
 import json
+import math
 import os
+import threading
+import time
 from datetime import datetime
 import io
 
+from aggregates import InvoiceAggregates
+from export import stream_zip
+from importer import (InvalidImport, compute_totals, parse_csv, parse_ndjson, validate,
+                      validate_dates)
+from jobs import PDFJobQueue, QueueFull
+from pdf_cache import PDFCache
+from metrics import Gauge, Registry
+from pdf_render import build_pdf, build_story, invoice_hash
+from store import InvoiceStore
+
 app = Flask(__name__)
 
+# Metrics served on /metrics in Prometheus text format
+metrics = Registry()
+request_latency = metrics.histogram(
+    'invoicelite_request_duration_seconds', 'Request latency by route',
+    ('method', 'route', 'status'))
+requests_in_flight = metrics.gauge(
+    'invoicelite_requests_in_flight', 'Requests currently being handled')
+pdf_stage_latency = metrics.histogram(
+    'invoicelite_pdf_stage_duration_seconds', 'Time spent in each PDF download stage',
+    ('stage',))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    requests_in_flight.inc()
+
+@app.after_request
+def record_request_latency(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_latency.observe(time.perf_counter() - g.request_started,
+                            request.method, route, str(response.status_code))
+    return response
+
+@app.teardown_request
+def finish_request(exc):
+    if 'request_started' in g:
+        requests_in_flight.dec()
+
+# Rendered PDF cache: in-memory LRU plus an optional on-disk tier, each
+# bounded in bytes
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR')
+PDF_CACHE_DISK_MAX_BYTES = int(os.environ.get('PDF_CACHE_DISK_MAX_BYTES', 512 * 1024 * 1024))
+
+pdf_cache = PDFCache(PDF_CACHE_MAX_BYTES, PDF_CACHE_DIR, PDF_CACHE_DISK_MAX_BYTES)
+
+# Process pool for bulk PDF rendering, started on first use
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', os.cpu_count() or 1))
+render_pool = None
+
+def get_render_pool():
+    global render_pool
+    if render_pool is None:
+        render_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        atexit.register(render_pool.shutdown)
+    return render_pool
+
+# Async PDF jobs share the render pool. New jobs are refused while
+# PDF_JOB_MAX_PENDING are outstanding; results expire after PDF_JOB_RESULT_TTL.
+PDF_JOB_MAX_PENDING = int(os.environ.get('PDF_JOB_MAX_PENDING', 100))
+PDF_JOB_RESULT_TTL = int(os.environ.get('PDF_JOB_RESULT_TTL', 600))
+
+pdf_jobs = PDFJobQueue(get_render_pool, pdf_cache, PDF_JOB_MAX_PENDING, PDF_JOB_RESULT_TTL)
+
 # In-memory storage (replace with database in production)
-invoices = []
+invoices = InvoiceStore()
 clients = []
 invoice_counter = 1
+# Held while numbers are assigned so bulk imports get contiguous INV- numbers
+invoice_lock = threading.Lock()
+aggregates = InvoiceAggregates()
 
 @app.route('/')
 def index():
@@ -39,169 +107,367 @@ def handle_clients():
     
     return jsonify(clients)
 
+def calculate_totals(invoice):
+    subtotal = sum(float(item['quantity']) * float(item['rate']) for item in invoice['items'])
+    tax_amount = subtotal * (invoice['tax_rate'] / 100)
+    total = subtotal + tax_amount
+    
+    invoice['subtotal'] = round(subtotal, 2)
+    invoice['tax_amount'] = round(tax_amount, 2)
+    invoice['total'] = round(total, 2)
+
+def new_invoice(invoice_id, invoice_data):
+    return {
+        'id': invoice_id,
+        'invoice_number': f'INV-{invoice_id:04d}',
+        'client_id': invoice_data['client_id'],
+        'client_name': invoice_data['client_name'],
+        'date': invoice_data['date'],
+        'due_date': invoice_data['due_date'],
+        'items': invoice_data['items'],
+        'tax_rate': float(invoice_data.get('tax_rate') or 0),
+        'notes': invoice_data.get('notes') or '',
+        'status': 'draft',
+        'created_at': datetime.now().isoformat()
+    }
+
 @app.route('/api/invoices', methods=['GET', 'POST'])
 def handle_invoices():
     global invoices, invoice_counter
     
     if request.method == 'POST':
         invoice_data = request.json
+        # Dates must index cleanly; other fields are checked as before
+        if not isinstance(invoice_data, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        errors = validate_dates(invoice_data, 1)
+        if errors:
+            return jsonify({'error': 'Validation failed', 'details': errors}), 400
         
-        # Calculate totals
-        subtotal = sum(float(item['quantity']) * float(item['rate']) for item in invoice_data['items'])
-        tax_amount = subtotal * (float(invoice_data.get('tax_rate', 0)) / 100)
-        total = subtotal + tax_amount
-        
-        invoice = {
-            'id': invoice_counter,
-            'invoice_number': f'INV-{invoice_counter:04d}',
-            'client_id': invoice_data['client_id'],
-            'client_name': invoice_data['client_name'],
-            'date': invoice_data['date'],
-            'due_date': invoice_data['due_date'],
-            'items': invoice_data['items'],
-            'subtotal': round(subtotal, 2),
-            'tax_rate': float(invoice_data.get('tax_rate', 0)),
-            'tax_amount': round(tax_amount, 2),
-            'total': round(total, 2),
-            'notes': invoice_data.get('notes', ''),
-            'status': 'draft',
-            'created_at': datetime.now().isoformat()
-        }
-        
-        invoices.append(invoice)
-        invoice_counter += 1
+        with invoice_lock:
+            invoice = new_invoice(invoice_counter, invoice_data)
+            calculate_totals(invoice)
+            if not math.isfinite(invoice['total']):
+                return jsonify({'error': 'Validation failed',
+                                'details': ['invoice 1: total must be a finite number']}), 400
+            
+            invoices.add(invoice)
+            aggregates.add(invoice)
+            invoice_counter += 1
         return jsonify(invoice), 201
     
-    return jsonify(invoices)
+    return list_invoices()
+
+def list_filters():
+    return {
+        'client_id': request.args.get('client_id'),
+        'status': request.args.get('status'),
+        'date_from': request.args.get('date_from'),
+        'date_to': request.args.get('date_to')
+    }
+
+def list_invoices():
+    # Without paging arguments the full list is returned as before.
+    # limit/cursor switch to cursor pagination; format=ndjson or
+    # format=stream stream every match with bounded memory.
+    filters = list_filters()
+    fmt = request.args.get('format')
+    cursor = request.args.get('cursor', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    
+    if fmt == 'ndjson':
+        def generate_ndjson():
+            for invoice in invoices.iter_query(after=cursor, **filters):
+                yield json.dumps(invoice) + '\n'
+        return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    
+    if fmt == 'stream':
+        def generate_json():
+            yield '['
+            separator = ''
+            for invoice in invoices.iter_query(after=cursor, **filters):
+                yield separator + json.dumps(invoice)
+                separator = ','
+            yield ']'
+        return Response(stream_with_context(generate_json()), mimetype='application/json')
+    
+    if limit is None and not request.args.get('cursor'):
+        return jsonify(invoices.query(**filters))
+    
+    limit = max(1, min(limit or 100, 1000))
+    page = invoices.query(after=cursor, limit=limit + 1, **filters)
+    has_more = len(page) > limit
+    page = page[:limit]
+    return jsonify({
+        'invoices': page,
+        'next_cursor': page[-1]['id'] if has_more else None
+    })
+
+@app.route('/api/invoices/number/<invoice_number>')
+def get_invoice_by_number(invoice_number):
+    invoice = invoices.get_by_number(invoice_number)
+    if not invoice:
+        return jsonify({'error': 'Invoice not found'}), 404
+    return jsonify(invoice)
+
+@app.route('/api/invoices/import', methods=['POST'])
+def import_invoices():
+    # CSV (one row per line item, grouped by a `ref` column) or NDJSON (one
+    # invoice per line, same shape as POST /api/invoices). All invoices are
+    # validated first and committed together, or none are.
+    global invoice_counter
+    started = time.perf_counter()
+    
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'csv' if request.mimetype in ('text/csv', 'application/csv') else 'ndjson'
+    try:
+        if fmt == 'csv':
+            batch = parse_csv(request.stream)
+        else:
+            batch = list(parse_ndjson(request.stream))
+    except (InvalidImport, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not batch:
+        return jsonify({'error': 'No invoices in request'}), 400
+    
+    errors = []
+    for position, invoice_data in enumerate(batch, 1):
+        if not isinstance(invoice_data, dict):
+            errors.append(f'invoice {position}: expected an object')
+            continue
+        errors.extend(validate(invoice_data, position))
+    if errors:
+        return jsonify({'error': 'Validation failed', 'details': errors[:100],
+                        'error_count': len(errors)}), 400
+    
+    totals = compute_totals(batch)
+    # Finite inputs can still overflow once multiplied out
+    errors = [f'invoice {position}: total is too large'
+              for position, (_, _, total) in enumerate(totals, 1) if not math.isfinite(total)]
+    if errors:
+        return jsonify({'error': 'Validation failed', 'details': errors[:100],
+                        'error_count': len(errors)}), 400
+    line_count = sum(len(invoice_data['items']) for invoice_data in batch)
+    
+    with invoice_lock:
+        first_id = invoice_counter
+        created = []
+        for offset, (invoice_data, (subtotal, tax_amount, total)) in enumerate(zip(batch, totals)):
+            invoice = new_invoice(first_id + offset, invoice_data)
+            invoice.update(subtotal=subtotal, tax_amount=tax_amount, total=total)
+            created.append(invoice)
+        # Both steps are all-or-nothing; the counter only moves once the
+        # whole batch is visible
+        invoices.add_many(created)
+        try:
+            aggregates.add_many(created)
+        except Exception:
+            for invoice in created:
+                invoices.remove(invoice)
+            raise
+        invoice_counter = first_id + len(created)
+    
+    elapsed = time.perf_counter() - started
+    return jsonify({
+        'imported': len(created),
+        'line_items': line_count,
+        'first_invoice_number': created[0]['invoice_number'],
+        'last_invoice_number': created[-1]['invoice_number'],
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'invoices_per_second': round(len(created) / elapsed, 1) if elapsed else None,
+        'line_items_per_second': round(line_count / elapsed, 1) if elapsed else None
+    }), 201
+
+# Fields a client may change on an existing invoice
+EDITABLE_FIELDS = ('client_id', 'client_name', 'date', 'due_date', 'items',
+                   'tax_rate', 'notes', 'status')
+
+@app.route('/api/invoices/<int:invoice_id>', methods=['GET', 'PUT', 'DELETE'])
+def handle_invoice(invoice_id):
+    invoice = invoices.get(invoice_id)
+    if not invoice:
+        return jsonify({'error': 'Invoice not found'}), 404
+    
+    if request.method == 'PUT':
+        invoice_data = request.json
+        if not isinstance(invoice_data, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        
+        # Re-fetched under the lock: a DELETE may have won the race
+        with invoice_lock:
+            invoice = invoices.get(invoice_id)
+            if not invoice:
+                return jsonify({'error': 'Invoice not found'}), 404
+            updated = dict(invoice)
+            for field in EDITABLE_FIELDS:
+                if field in invoice_data:
+                    updated[field] = invoice_data[field]
+            errors = validate(updated, invoice_id)
+            if errors:
+                return jsonify({'error': 'Validation failed', 'details': errors}), 400
+            updated['tax_rate'] = float(updated['tax_rate'] or 0)
+            calculate_totals(updated)
+            if not math.isfinite(updated['total']):
+                return jsonify({'error': 'Validation failed',
+                                'details': [f'invoice {invoice_id}: total is too large']}), 400
+            
+            aggregates.update(invoice, updated)
+            invoices.update(invoice, updated)
+            return jsonify(invoice)
+    
+    if request.method == 'DELETE':
+        with invoice_lock:
+            invoice = invoices.get(invoice_id)
+            if not invoice:
+                return jsonify({'error': 'Invoice not found'}), 404
+            invoices.remove(invoice)
+            aggregates.remove(invoice)
+        return jsonify({'deleted': invoice_id})
+    
+    return jsonify(invoice)
 
 @app.route('/api/invoices/<int:invoice_id>/pdf')
 def generate_pdf(invoice_id):
-    invoice = next((inv for inv in invoices if inv['id'] == invoice_id), None)
+    with pdf_stage_latency.time('lookup'):
+        invoice = invoices.get(invoice_id)
     if not invoice:
         return jsonify({'error': 'Invoice not found'}), 404
     
-    # Create PDF in memory
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=1*inch)
-    
-    # Get styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        textColor=colors.HexColor('#667eea')
-    )
+    # Serve from cache when this exact content was rendered before
+    with pdf_stage_latency.time('cache'):
+        key = invoice_hash(invoice)
+        pdf = pdf_cache.get(key)
+    if pdf is None:
+        with pdf_stage_latency.time('story'):
+            story = build_story(invoice)
+        with pdf_stage_latency.time('build'):
+            pdf = build_pdf(story)
+        pdf_cache.put(key, pdf)
+    
+    with pdf_stage_latency.time('send_file'):
+        return send_file(
+            io.BytesIO(pdf),
+            as_attachment=True,
+            download_name=f"{invoice['invoice_number']}.pdf",
+            mimetype='application/pdf'
+        )
+
+@app.route('/api/invoices/<int:invoice_id>/pdf/jobs', methods=['POST'])
+def create_pdf_job(invoice_id):
+    invoice = invoices.get(invoice_id)
+    if not invoice:
+        return jsonify({'error': 'Invoice not found'}), 404
     
-    # Build PDF content
-    story = []
-    
-    # Header
-    story.append(Paragraph("INVOICE", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Invoice details
-    invoice_info = [
-        ['Invoice Number:', invoice['invoice_number']],
-        ['Date:', invoice['date']],
-        ['Due Date:', invoice['due_date']],
-        ['Client:', invoice['client_name']]
-    ]
-    
-    info_table = Table(invoice_info, colWidths=[2*inch, 3*inch])
-    info_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-    ]))
-    
-    story.append(info_table)
-    story.append(Spacer(1, 30))
-    
-    # Items table
-    items_data = [['Description', 'Quantity', 'Rate', 'Amount']]
-    for item in invoice['items']:
-        amount = float(item['quantity']) * float(item['rate'])
-        items_data.append([
-            item['description'],
-            str(item['quantity']),
-            f"${float(item['rate']):.2f}",
-            f"${amount:.2f}"
-        ])
-    
-    items_table = Table(items_data, colWidths=[3*inch, 1*inch, 1*inch, 1*inch])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    story.append(items_table)
-    story.append(Spacer(1, 20))
-    
-    # Totals
-    totals_data = [
-        ['Subtotal:', f"${invoice['subtotal']:.2f}"],
-        [f"Tax ({invoice['tax_rate']}%):", f"${invoice['tax_amount']:.2f}"],
-        ['Total:', f"${invoice['total']:.2f}"]
-    ]
-    
-    totals_table = Table(totals_data, colWidths=[4*inch, 2*inch])
-    totals_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-    ]))
-    
-    story.append(totals_table)
-    
-    # Notes
-    if invoice['notes']:
-        story.append(Spacer(1, 30))
-        story.append(Paragraph("Notes:", styles['Heading3']))
-        story.append(Paragraph(invoice['notes'], styles['Normal']))
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
+    try:
+        # Copy so later edits do not change what the job renders
+        job = pdf_jobs.submit(dict(invoice))
+    except QueueFull:
+        response = jsonify({'error': 'PDF queue is full, try again later'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    result = pdf_jobs.describe(job)
+    result['status_url'] = f"/api/jobs/{job['id']}"
+    result['download_url'] = f"/api/jobs/{job['id']}/download"
+    return jsonify(result), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_pdf_job(job_id):
+    job = pdf_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(pdf_jobs.describe(job))
+
+@app.route('/api/jobs/<job_id>/download')
+def download_pdf_job(job_id):
+    job = pdf_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error']}), 500
+    if job['status'] != 'done':
+        return jsonify({'error': 'PDF is not ready yet', 'status': job['status']}), 409
     
     return send_file(
-        buffer,
+        io.BytesIO(job['result']),
         as_attachment=True,
-        download_name=f"{invoice['invoice_number']}.pdf",
+        download_name=job['filename'],
         mimetype='application/pdf'
     )
 
+def filter_invoices(criteria):
+    # Explicit ids win over the other filters
+    if criteria.get('ids') is not None:
+        selected = (invoices.get(i) for i in criteria['ids'])
+        return [inv for inv in selected if inv]
+    
+    return invoices.query(
+        client_id=criteria.get('client_id'),
+        status=criteria.get('status'),
+        date_from=criteria.get('date_from'),
+        date_to=criteria.get('date_to')
+    )
+
+@app.route('/api/invoices/export', methods=['POST'])
+def export_invoices():
+    criteria = request.json
+    if criteria is None:
+        criteria = {}
+    if not isinstance(criteria, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    ids = criteria.get('ids')
+    if ids is not None and not (isinstance(ids, list) and all(
+            isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        return jsonify({'error': 'ids must be a list of integers'}), 400
+    selected = filter_invoices(criteria)
+    if not selected:
+        return jsonify({'error': 'No invoices match'}), 404
+    
+    # Renders run on the process pool; the ZIP is streamed as each PDF
+    # finishes, with at most two renders per worker queued at once
+    zip_stream = stream_zip(selected, get_render_pool(), pdf_cache, PDF_WORKERS * 2)
+    filename = f"invoices-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip"
+    return Response(
+        stream_with_context(zip_stream),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/api/analytics')
 def analytics():
-    total_invoices = len(invoices)
-    total_revenue = sum(inv['total'] for inv in invoices)
-    avg_invoice = total_revenue / total_invoices if total_invoices > 0 else 0
-    
-    # Monthly data
-    monthly_data = {}
-    for invoice in invoices:
-        month = invoice['date'][:7]  # YYYY-MM
-        if month not in monthly_data:
-            monthly_data[month] = {'count': 0, 'revenue': 0}
-        monthly_data[month]['count'] += 1
-        monthly_data[month]['revenue'] += invoice['total']
-    
-    return jsonify({
-        'total_invoices': total_invoices,
-        'total_revenue': round(total_revenue, 2),
-        'average_invoice': round(avg_invoice, 2),
-        'monthly_data': monthly_data
-    })
+    # Answered from running aggregates; date filters work per month
+    # (YYYY-MM or YYYY-MM-DD, the day part is ignored)
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+    result = aggregates.summary(
+        month_from=date_from[:7] if date_from else None,
+        month_to=date_to[:7] if date_to else None,
+        client_id=request.args.get('client_id'),
+        status=request.args.get('status')
+    )
+    if request.args.get('breakdown'):
+        result.update(aggregates.breakdown())
+    return jsonify(result)
+
+def collect_pdf_metrics():
+    cache_stats = pdf_cache.stats()
+    cache = Gauge('invoicelite_pdf_cache', 'PDF cache counters and size', ('field',))
+    for field in ('hits', 'disk_hits', 'misses', 'entries', 'bytes', 'disk_bytes'):
+        cache.set(field, value=cache_stats[field])
+    lookups = cache_stats['hits'] + cache_stats['disk_hits'] + cache_stats['misses']
+    hit_rate = Gauge('invoicelite_pdf_cache_hit_ratio', 'Share of PDF lookups served from cache')
+    hit_rate.set(value=(cache_stats['hits'] + cache_stats['disk_hits']) / lookups if lookups else 0)
+    jobs = Gauge('invoicelite_pdf_jobs_active', 'Async PDF jobs queued or running')
+    jobs.set(value=pdf_jobs.active)
+    return [cache, hit_rate, jobs]
+
+metrics.add_collector(collect_pdf_metrics)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,81 @@
+import logging
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from pdf_render import invoice_hash, render_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+
+class _ZipSink:
+    # Write-only file object for ZipFile. It has no tell()/seek(), so
+    # zipfile writes in streaming mode and we hand out the bytes as soon as
+    # each member is complete.
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def render_many(invoices, pool, cache, max_in_flight):
+    # Yields (invoice, pdf, error) in completion order; pdf is None and
+    # error is set when that invoice failed to render. Cached PDFs are
+    # yielded right away; at most max_in_flight renders are queued.
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            invoice, key = pending.pop(future)
+            try:
+                pdf = future.result()
+            except Exception as e:
+                yield invoice, None, e
+                continue
+            cache.put(key, pdf)
+            yield invoice, pdf, None
+
+    for invoice in invoices:
+        key = invoice_hash(invoice)
+        pdf = cache.get(key)
+        if pdf is not None:
+            yield invoice, pdf, None
+            continue
+
+        if len(pending) >= max_in_flight:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+        pending[pool.submit(render_invoice_pdf, invoice)] = (invoice, key)
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        yield from collect(done)
+
+
+def stream_zip(invoices, pool, cache, max_in_flight):
+    # The response is already under way when a render fails, so failed
+    # invoices are left out and listed in an errors.txt member instead
+    sink = _ZipSink()
+    failures = []
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for invoice, pdf, error in render_many(invoices, pool, cache, max_in_flight):
+            if error is not None:
+                logger.error('Export: rendering %s failed: %r', invoice['invoice_number'], error)
+                failures.append(f"{invoice['invoice_number']}: {error!r}")
+                continue
+            archive.writestr(f"{invoice['invoice_number']}.pdf", pdf)
+            yield sink.drain()
+        if failures:
+            archive.writestr('errors.txt', 'These invoices could not be rendered:\n'
+                             + '\n'.join(failures) + '\n')
+    yield sink.drain()
@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import math
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:  # totals fall back to plain Python
+    np = None
+
+# CSV imports have one row per line item; rows sharing a `ref` form one
+# invoice and the invoice-level columns are read from its first row.
+CSV_INVOICE_FIELDS = ('client_id', 'client_name', 'date', 'due_date', 'tax_rate', 'notes')
+CSV_ITEM_FIELDS = ('description', 'quantity', 'rate')
+
+
+class InvalidImport(Exception):
+    pass
+
+
+def parse_ndjson(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8')
+    for line_number, line in enumerate(text, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise InvalidImport(f'line {line_number}: invalid JSON ({e})')
+
+
+def parse_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    grouped = {}
+    for row_number, row in enumerate(csv.DictReader(text), 2):
+        ref = row.get('ref') or f'row-{row_number}'
+        invoice = grouped.get(ref)
+        if invoice is None:
+            invoice = {field: row.get(field) for field in CSV_INVOICE_FIELDS}
+            invoice['items'] = []
+            grouped[ref] = invoice
+        invoice['items'].append({field: row.get(field) for field in CSV_ITEM_FIELDS})
+    return list(grouped.values())
+
+
+def valid_date(value):
+    # Dates are kept as YYYY-MM-DD strings; the indexes sort them as text
+    if not isinstance(value, str) or len(value) != 10:
+        return False
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return False
+    return True
+
+
+def finite_number(value):
+    # float() also accepts 'nan', 'inf' and '1e999'; none of them can be
+    # summed into the aggregates or rendered
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def validate_dates(invoice_data, position):
+    return [f'invoice {position}: {field} must be a YYYY-MM-DD date'
+            for field in ('date', 'due_date')
+            if invoice_data.get(field) not in (None, '') and not valid_date(invoice_data[field])]
+
+
+def validate(invoice_data, position):
+    errors = []
+    for field in ('client_id', 'client_name', 'date', 'due_date'):
+        if invoice_data.get(field) in (None, ''):
+            errors.append(f'invoice {position}: {field} is required')
+    errors.extend(validate_dates(invoice_data, position))
+    items = invoice_data.get('items')
+    if not isinstance(items, list) or not items:
+        errors.append(f'invoice {position}: at least one item is required')
+        return errors
+    if not finite_number(invoice_data.get('tax_rate') or 0):
+        errors.append(f'invoice {position}: tax_rate must be a number')
+    for n, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            errors.append(f'invoice {position}, item {n}: expected an object')
+            continue
+        if not isinstance(item.get('description'), str):
+            errors.append(f'invoice {position}, item {n}: description is required')
+        if not (finite_number(item.get('quantity')) and finite_number(item.get('rate'))):
+            errors.append(f'invoice {position}, item {n}: quantity and rate must be numbers')
+    return errors
+
+
+def compute_totals(invoice_list):
+    # One batched pass over every line item of every invoice. Returns
+    # (subtotal, tax_amount, total) per invoice, rounded like
+    # calculate_totals() in app.py.
+    owners = []
+    quantities = []
+    rates = []
+    for index, invoice_data in enumerate(invoice_list):
+        for item in invoice_data['items']:
+            owners.append(index)
+            quantities.append(float(item['quantity']))
+            rates.append(float(item['rate']))
+    tax_rates = [float(inv.get('tax_rate') or 0) for inv in invoice_list]
+
+    if np is not None:
+        # Overflow yields inf like plain floats do; callers reject it
+        with np.errstate(over='ignore', invalid='ignore'):
+            amounts = np.asarray(quantities) * np.asarray(rates)
+            subtotals = np.bincount(np.asarray(owners, dtype=np.intp), weights=amounts,
+                                    minlength=len(invoice_list))
+            taxes = subtotals * (np.asarray(tax_rates) / 100)
+            totals = subtotals + taxes
+        subtotals, taxes, totals = subtotals.tolist(), taxes.tolist(), totals.tolist()
+    else:
+        subtotals = [0] * len(invoice_list)
+        for owner, quantity, rate in zip(owners, quantities, rates):
+            subtotals[owner] += quantity * rate
+        taxes = [subtotal * (tax_rate / 100) for subtotal, tax_rate in zip(subtotals, tax_rates)]
+        totals = [subtotal + tax for subtotal, tax in zip(subtotals, taxes)]
+
+    return [(round(s, 2), round(t, 2), round(total, 2))
+            for s, t, total in zip(subtotals, taxes, totals)]
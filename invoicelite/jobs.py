@@ -0,0 +1,99 @@
+import threading
+import time
+import uuid
+
+from pdf_render import invoice_hash, render_invoice_pdf
+
+
+class QueueFull(Exception):
+    pass
+
+
+class PDFJobQueue:
+    # Background PDF rendering. Jobs run on the shared render pool; at most
+    # max_pending jobs may be queued or running at once, and finished jobs
+    # are dropped result_ttl seconds after they complete.
+
+    def __init__(self, get_pool, cache, max_pending=100, result_ttl=600):
+        self.get_pool = get_pool
+        self.cache = cache
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.active = 0
+
+    def _expire(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job['finished_at'] and now - job['finished_at'] > self.result_ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _finish(self, job, key, future):
+        with self.lock:
+            self.active -= 1
+            job['finished_at'] = time.time()
+            error = future.exception()
+            if error is not None:
+                job['status'] = 'failed'
+                job['error'] = str(error)
+                return
+            job['status'] = 'done'
+            job['result'] = future.result()
+        self.cache.put(key, job['result'])
+
+    def submit(self, invoice):
+        key = invoice_hash(invoice)
+        job = {
+            'id': uuid.uuid4().hex,
+            'invoice_id': invoice['id'],
+            'filename': f"{invoice['invoice_number']}.pdf",
+            'status': 'queued',
+            'created_at': time.time(),
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+
+        pdf = self.cache.get(key)
+        with self.lock:
+            self._expire()
+            if pdf is not None:
+                job.update(status='done', result=pdf, finished_at=time.time())
+                self.jobs[job['id']] = job
+                return job
+            if self.active >= self.max_pending:
+                raise QueueFull()
+            self.active += 1
+            self.jobs[job['id']] = job
+
+        try:
+            future = self.get_pool().submit(render_invoice_pdf, invoice)
+        except Exception:
+            with self.lock:
+                self.active -= 1
+                del self.jobs[job['id']]
+            raise
+        job['future'] = future
+        future.add_done_callback(lambda f: self._finish(job, key, f))
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            self._expire()
+            job = self.jobs.get(job_id)
+            if job and job['status'] == 'queued' and job['future'].running():
+                job['status'] = 'running'
+            return job
+
+    def describe(self, job):
+        return {
+            'job_id': job['id'],
+            'invoice_id': job['invoice_id'],
+            'status': job['status'],
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'finished_at': job['finished_at'],
+            'expires_at': job['finished_at'] + self.result_ttl if job['finished_at'] else None
+        }
@@ -0,0 +1,137 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, key)} {_format_number(value)}')
+        return lines
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        with self.lock:
+            self.values[label_values] = value
+
+
+class Histogram(_Metric):
+    # Fixed buckets; observe() is a bisect and three additions under a lock
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(label_values)
+            if series is None:
+                series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self):
+        lines = self.header()
+        with self.lock:
+            snapshot = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self.values.items())
+        for key, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, f'le="{_format_number(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {_format_number(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def add_collector(self, collect):
+        # collect() is called at scrape time and returns extra metrics
+        self.collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            for metric in collect():
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
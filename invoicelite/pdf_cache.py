@@ -0,0 +1,128 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class PDFCache:
+    # Rendered PDFs keyed by invoice content hash. The memory tier is an
+    # LRU bounded by total bytes; the optional disk tier keeps PDFs across
+    # restarts and serves entries evicted from memory. The disk tier is
+    # bounded by disk_max_bytes too: reads bump a file's mtime, and once the
+    # directory grows past the cap the least recently used files are
+    # deleted until it is back under DISK_LOW_WATER of the cap.
+    DISK_LOW_WATER = 0.9
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None,
+                 disk_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.lock = threading.Lock()
+        self.disk_lock = threading.Lock()
+        self.disk_size = 0
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_size = sum(size for _, size, _ in self._disk_files())
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.pdf')
+
+    def _disk_files(self):
+        # (mtime, size, path) of every cached PDF
+        files = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pdf'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _trim_disk(self):
+        # Rescans instead of trusting disk_size, which other worker
+        # processes sharing the directory do not update
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * self.DISK_LOW_WATER
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.disk_size = total
+
+    def _remember(self, key, pdf):
+        if len(pdf) > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.entries[key] = pdf
+        self.size += len(pdf)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get(self, key):
+        with self.lock:
+            pdf = self.entries.get(key)
+            if pdf is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return pdf
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    pdf = f.read()
+                os.utime(path)
+            except FileNotFoundError:
+                pdf = None
+            if pdf is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                    self._remember(key, pdf)
+                return pdf
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, pdf):
+        with self.lock:
+            self._remember(key, pdf)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp_path, path)
+            with self.disk_lock:
+                self.disk_size += len(pdf)
+                if self.disk_size > self.disk_max_bytes:
+                    self._trim_disk()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'disk_bytes': self.disk_size,
+                'disk_max_bytes': self.disk_max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,128 @@
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+import hashlib
+import io
+import json
+
+# Bump when the layout changes so cached PDFs are not reused
+RENDER_VERSION = 1
+
+# Styles are built once at import and shared by every render
+styles = getSampleStyleSheet()
+title_style = ParagraphStyle(
+    'CustomTitle',
+    parent=styles['Heading1'],
+    fontSize=24,
+    spaceAfter=30,
+    textColor=colors.HexColor('#667eea')
+)
+
+info_table_style = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+])
+
+items_table_style = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+totals_table_style = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
+])
+
+# Fields that end up in the rendered document
+RENDERED_FIELDS = ('invoice_number', 'date', 'due_date', 'client_name', 'items',
+                   'subtotal', 'tax_rate', 'tax_amount', 'total', 'notes')
+
+
+def invoice_hash(invoice):
+    content = {field: invoice.get(field) for field in RENDERED_FIELDS}
+    content['_version'] = RENDER_VERSION
+    payload = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def build_story(invoice):
+    story = []
+
+    # Header
+    story.append(Paragraph("INVOICE", title_style))
+    story.append(Spacer(1, 20))
+
+    # Invoice details
+    invoice_info = [
+        ['Invoice Number:', invoice['invoice_number']],
+        ['Date:', invoice['date']],
+        ['Due Date:', invoice['due_date']],
+        ['Client:', invoice['client_name']]
+    ]
+
+    info_table = Table(invoice_info, colWidths=[2*inch, 3*inch])
+    info_table.setStyle(info_table_style)
+
+    story.append(info_table)
+    story.append(Spacer(1, 30))
+
+    # Items table
+    items_data = [['Description', 'Quantity', 'Rate', 'Amount']]
+    for item in invoice['items']:
+        amount = float(item['quantity']) * float(item['rate'])
+        items_data.append([
+            item['description'],
+            str(item['quantity']),
+            f"${float(item['rate']):.2f}",
+            f"${amount:.2f}"
+        ])
+
+    items_table = Table(items_data, colWidths=[3*inch, 1*inch, 1*inch, 1*inch])
+    items_table.setStyle(items_table_style)
+
+    story.append(items_table)
+    story.append(Spacer(1, 20))
+
+    # Totals
+    totals_data = [
+        ['Subtotal:', f"${invoice['subtotal']:.2f}"],
+        [f"Tax ({invoice['tax_rate']}%):", f"${invoice['tax_amount']:.2f}"],
+        ['Total:', f"${invoice['total']:.2f}"]
+    ]
+
+    totals_table = Table(totals_data, colWidths=[4*inch, 2*inch])
+    totals_table.setStyle(totals_table_style)
+
+    story.append(totals_table)
+
+    # Notes
+    if invoice['notes']:
+        story.append(Spacer(1, 30))
+        story.append(Paragraph("Notes:", styles['Heading3']))
+        story.append(Paragraph(invoice['notes'], styles['Normal']))
+
+    return story
+
+
+def build_pdf(story):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=1*inch)
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def render_invoice_pdf(invoice):
+    return build_pdf(build_story(invoice))
@@ -0,0 +1,167 @@
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+
+def _remove_sorted(values, value):
+    index = bisect_left(values, value)
+    if index < len(values) and values[index] == value:
+        values.pop(index)
+
+
+class InvoiceStore:
+    # In-memory invoices with indexes by id, invoice number, client and
+    # date. Listings are always in id order so an id works as a cursor.
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.by_id = {}
+        self.by_number = {}
+        self.ids = []
+        self.by_client = {}
+        self.by_date = []
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.by_id.values()))
+
+    def _index(self, invoice):
+        invoice_id = invoice['id']
+        self.by_number[invoice['invoice_number']] = invoice_id
+        insort(self.by_client.setdefault(str(invoice['client_id']), []), invoice_id)
+        insort(self.by_date, (invoice['date'], invoice_id))
+
+    def _unindex(self, invoice):
+        invoice_id = invoice['id']
+        self.by_number.pop(invoice['invoice_number'], None)
+        client_ids = self.by_client.get(str(invoice['client_id']), [])
+        _remove_sorted(client_ids, invoice_id)
+        if not client_ids:
+            self.by_client.pop(str(invoice['client_id']), None)
+        _remove_sorted(self.by_date, (invoice['date'], invoice_id))
+
+    def add(self, invoice):
+        with self.lock:
+            self.by_id[invoice['id']] = invoice
+            insort(self.ids, invoice['id'])
+            self._index(invoice)
+
+    def add_many(self, new_invoices):
+        # All or nothing: the merged indexes are built on the side, so a
+        # row that cannot be indexed raises before anything is visible
+        with self.lock:
+            ids = sorted(self.ids + [invoice['id'] for invoice in new_invoices])
+            by_date = sorted(self.by_date + [(invoice['date'], invoice['id'])
+                                             for invoice in new_invoices])
+            by_client = {}
+            for invoice in new_invoices:
+                client_key = str(invoice['client_id'])
+                if client_key not in by_client:
+                    by_client[client_key] = list(self.by_client.get(client_key, []))
+                by_client[client_key].append(invoice['id'])
+            for client_ids in by_client.values():
+                client_ids.sort()
+            
+            self.ids = ids
+            self.by_date = by_date
+            self.by_client.update(by_client)
+            for invoice in new_invoices:
+                self.by_id[invoice['id']] = invoice
+                self.by_number[invoice['invoice_number']] = invoice['id']
+
+    def update(self, invoice, changes):
+        # Applies changes in place and moves the invoice between indexes
+        with self.lock:
+            self._unindex(invoice)
+            invoice.update(changes)
+            self._index(invoice)
+
+    def remove(self, invoice):
+        with self.lock:
+            self.by_id.pop(invoice['id'], None)
+            _remove_sorted(self.ids, invoice['id'])
+            self._unindex(invoice)
+
+    def get(self, invoice_id):
+        return self.by_id.get(invoice_id)
+
+    def get_by_number(self, invoice_number):
+        with self.lock:
+            invoice_id = self.by_number.get(invoice_number)
+            return self.by_id.get(invoice_id) if invoice_id else None
+
+    @staticmethod
+    def _matches(invoice, status, date_from, date_to):
+        if status is not None and invoice['status'] != status:
+            return False
+        if date_from and invoice['date'] < date_from:
+            return False
+        if date_to and invoice['date'] > date_to:
+            return False
+        return True
+
+    def _date_range_ids(self, date_from, date_to, after, status=None):
+        # Ids (> after) of the invoices in a date range, in date index order
+        lo = bisect_left(self.by_date, (date_from or '',))
+        hi = bisect_right(self.by_date, (date_to or '\uffff', float('inf')))
+        by_date = self.by_date
+        for index in range(lo, hi):
+            invoice_id = by_date[index][1]
+            if invoice_id > after and (status is None
+                                       or self.by_id[invoice_id]['status'] == status):
+                yield invoice_id
+
+    def query(self, client_id=None, status=None, date_from=None, date_to=None,
+              after=0, limit=None):
+        # Returns up to `limit` matching invoices with id > after. The most
+        # selective index narrows the candidates; status is checked per row.
+        with self.lock:
+            if client_id is None and (date_from or date_to):
+                # One pass over the range picks the lowest ids without
+                # sorting all of it
+                matches = self._date_range_ids(date_from, date_to, after, status)
+                ids = heapq.nsmallest(limit, matches) if limit is not None else sorted(matches)
+                return [self.by_id[invoice_id] for invoice_id in ids]
+
+            if client_id is not None:
+                candidates = self.by_client.get(str(client_id), [])
+            else:
+                candidates = self.ids
+            results = []
+            for index in range(bisect_right(candidates, after), len(candidates)):
+                invoice = self.by_id[candidates[index]]
+                if not self._matches(invoice, status, date_from, date_to):
+                    continue
+                results.append(invoice)
+                if limit is not None and len(results) >= limit:
+                    break
+            return results
+
+    def iter_query(self, page_size=500, after=0, **filters):
+        # Walks a query page by page so callers never hold the full result
+        # or the lock for long. A date range is collected and sorted once;
+        # its pages are then read back by id and re-checked, since invoices
+        # may change in between.
+        status = filters.get('status')
+        date_from, date_to = filters.get('date_from'), filters.get('date_to')
+        if filters.get('client_id') is None and (date_from or date_to):
+            with self.lock:
+                candidates = sorted(self._date_range_ids(date_from, date_to, after, status))
+            for start in range(0, len(candidates), page_size):
+                with self.lock:
+                    page = [self.by_id.get(invoice_id)
+                            for invoice_id in candidates[start:start + page_size]]
+                    page = [invoice for invoice in page if invoice is not None
+                            and self._matches(invoice, status, date_from, date_to)]
+                yield from page
+            return
+
+        while True:
+            page = self.query(after=after, limit=page_size, **filters)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]['id']
@@ -0,0 +1,170 @@
+# Password generation without the GUI.
+#
+# Characters come from os.urandom, read in large blocks. Each random byte is
+# mapped to a character with a precompiled bytes.translate() table; bytes at
+# or above the largest multiple of the alphabet size are dropped (rejection
+# sampling), so every character is equally likely.
+#
+#   python engine.py -n 1000000 -l 20 -o passwords.txt
+#   python engine.py -n 10 --no-symbols --exclude-ambiguous
+import argparse
+import os
+import string
+import sys
+import threading
+import weakref
+from functools import lru_cache, partial
+
+SYMBOLS = "!@#$%^&*()_+-=[]{}|;:,.<>?"
+AMBIGUOUS = "0O1lI"
+RANDOM_BUFFER_SIZE = 64 * 1024
+
+
+class CharsetPolicy:
+    # A compiled character set. table maps every accepted byte value b to
+    # alphabet[b % size]; rejected lists the byte values that would bias
+    # the result and are deleted instead.
+
+    def __init__(self, alphabet):
+        if not alphabet:
+            raise ValueError("Please select at least one character type!")
+        if len(alphabet) > 256 or not alphabet.isascii():
+            raise ValueError("Alphabet must be at most 256 ASCII characters")
+        self.alphabet = alphabet
+        self.size = len(alphabet)
+        self.limit = 256 - 256 % self.size
+        encoded = alphabet.encode('ascii')
+        self.table = bytes(encoded[b % self.size] if b < self.limit else 0 for b in range(256))
+        self.rejected = bytes(range(self.limit, 256))
+
+    def map(self, raw):
+        return raw.translate(self.table, self.rejected)
+
+
+@lru_cache(maxsize=None)
+def get_policy(uppercase=True, lowercase=True, numbers=True, symbols=True,
+               exclude_ambiguous=False):
+    # Same character order and ambiguous set as the GUI has always used
+    chars = ""
+    if uppercase:
+        chars += string.ascii_uppercase
+    if lowercase:
+        chars += string.ascii_lowercase
+    if numbers:
+        chars += string.digits
+    if symbols:
+        chars += SYMBOLS
+    if exclude_ambiguous:
+        chars = ''.join(c for c in chars if c not in AMBIGUOUS)
+    return CharsetPolicy(chars)
+
+
+def _reset_after_fork(engine_ref):
+    engine = engine_ref()
+    if engine is not None:
+        engine._reset()
+
+
+class PasswordEngine:
+    # Shares one buffer of random bytes across policies. The buffer is
+    # guarded by a lock and dropped in forked children, so no two callers
+    # ever get the same bytes.
+
+    def __init__(self, buffer_size=RANDOM_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.lock = threading.Lock()
+        self._buffer = b''
+        self._pos = 0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=partial(_reset_after_fork, weakref.ref(self)))
+
+    def _reset(self):
+        self.lock = threading.Lock()
+        self._buffer = b''
+        self._pos = 0
+
+    def _read(self, n):
+        with self.lock:
+            if n > self.buffer_size:
+                return os.urandom(n)
+            if self._pos + n > len(self._buffer):
+                self._buffer = os.urandom(self.buffer_size)
+                self._pos = 0
+            chunk = self._buffer[self._pos:self._pos + n]
+            self._pos += n
+            return chunk
+
+    def random_chars(self, policy, n):
+        # n uniformly chosen characters of the policy, as ASCII bytes
+        parts = []
+        have = 0
+        while have < n:
+            missing = n - have
+            # Ask for enough raw bytes to cover the expected rejections
+            mapped = policy.map(self._read(missing * 256 // policy.limit + 16))
+            parts.append(mapped)
+            have += len(mapped)
+        return b''.join(parts)[:n]
+
+    def generate(self, length, policy=None):
+        policy = policy or get_policy()
+        return self.random_chars(policy, length).decode('ascii')
+
+    def iter_batches(self, count, length, policy=None):
+        # Yields newline-terminated blocks of passwords, about buffer_size
+        # bytes each, so memory use does not grow with count
+        policy = policy or get_policy()
+        per_batch = max(1, self.buffer_size // (length + 1))
+        for start in range(0, count, per_batch):
+            batch = min(per_batch, count - start)
+            chars = self.random_chars(policy, batch * length)
+            lines = [chars[i:i + length] for i in range(0, len(chars), length)]
+            yield b'\n'.join(lines) + b'\n'
+
+    def generate_many(self, count, length, policy=None):
+        for block in self.iter_batches(count, length, policy):
+            yield from block.decode('ascii').splitlines()
+
+    def write(self, stream, count, length, policy=None):
+        # stream is a binary file object
+        for block in self.iter_batches(count, length, policy):
+            stream.write(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate passwords in bulk')
+    parser.add_argument('-n', '--count', type=int, default=1, help='number of passwords')
+    parser.add_argument('-l', '--length', type=int, default=12)
+    parser.add_argument('--no-uppercase', action='store_true')
+    parser.add_argument('--no-lowercase', action='store_true')
+    parser.add_argument('--no-numbers', action='store_true')
+    parser.add_argument('--no-symbols', action='store_true')
+    parser.add_argument('--exclude-ambiguous', action='store_true',
+                        help=f'leave out {AMBIGUOUS}')
+    parser.add_argument('-o', '--output', help='write to this file (mode 600) instead of stdout')
+    args = parser.parse_args()
+    if args.length < 1 or args.count < 0:
+        parser.error('length must be positive and count must not be negative')
+
+    try:
+        policy = get_policy(not args.no_uppercase, not args.no_lowercase,
+                            not args.no_numbers, not args.no_symbols, args.exclude_ambiguous)
+    except ValueError as e:
+        parser.error(str(e))
+
+    engine = PasswordEngine()
+    if args.output:
+        fd = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'wb') as f:
+            engine.write(f, args.count, args.length, policy)
+    else:
+        try:
+            engine.write(sys.stdout.buffer, args.count, args.length, policy)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # e.g. piped into head; stop quietly
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import random
-import string
+import os
 import pyperclip
 
+from engine import PasswordEngine, get_policy
+from strength import BreachedList, StrengthScorer
+
+# Optional common/breached password list; matching passwords rate as Weak
+BREACHED_LIST = os.environ.get('BREACHED_LIST')
+
 class PasswordGenerator:
     def __init__(self, root):
         self.root = root
@@ -19,6 +24,8 @@ class PasswordGenerator:
         self.symbols_var = tk.BooleanVar(value=True)
         self.exclude_ambiguous_var = tk.BooleanVar(value=False)
         
+        self.engine = PasswordEngine()
+        self.scorer = StrengthScorer(BreachedList.open(BREACHED_LIST) if BREACHED_LIST else None)
         self.setup_ui()
     
     def setup_ui(self):
@@ -87,25 +94,17 @@ class PasswordGenerator:
             messagebox.showerror("Error", "Please select at least one character type!")
             return
         
-        # Build character set
-        chars = ""
-        if self.uppercase_var.get():
-            chars += string.ascii_uppercase
-        if self.lowercase_var.get():
-            chars += string.ascii_lowercase
-        if self.numbers_var.get():
-            chars += string.digits
-        if self.symbols_var.get():
-            chars += "!@#$%^&*()_+-=[]{}|;:,.<>?"
-        
-        # Remove ambiguous characters if requested
-        if self.exclude_ambiguous_var.get():
-            ambiguous = "0O1lI"
-            chars = ''.join(c for c in chars if c not in ambiguous)
+        # Character set, compiled once per combination of options
+        try:
+            policy = get_policy(self.uppercase_var.get(), self.lowercase_var.get(),
+                                self.numbers_var.get(), self.symbols_var.get(),
+                                self.exclude_ambiguous_var.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
         
         # Generate password
-        length = self.length_var.get()
-        password = ''.join(random.choice(chars) for _ in range(length))
+        password = self.engine.generate(self.length_var.get(), policy)
         
         # Display password
         self.password_text.delete(1.0, tk.END)
@@ -117,30 +116,7 @@ class PasswordGenerator:
                                  fg=self.get_strength_color(strength))
     
     def calculate_strength(self, password):
-        score = 0
-        
-        # Length bonus
-        if len(password) >= 8:
-            score += 1
-        if len(password) >= 12:
-            score += 1
-        
-        # Character variety
-        if any(c.isupper() for c in password):
-            score += 1
-        if any(c.islower() for c in password):
-            score += 1
-        if any(c.isdigit() for c in password):
-            score += 1
-        if any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
-            score += 1
-        
-        if score <= 2:
-            return "Weak"
-        elif score <= 4:
-            return "Medium"
-        else:
-            return "Strong"
+        return self.scorer.label(password)
     
     def get_strength_color(self, strength):
         colors = {"Weak": "red", "Medium": "orange", "Strong": "green"}
@@ -0,0 +1,282 @@
+# Entropy-based password strength scoring.
+#
+# A password's entropy is length * log2(pool), where pool is the combined
+# size of the character classes it uses. Passwords found in a breached or
+# common-password list are always Weak. Lists are compiled once into a
+# sorted array of 64-bit BLAKE2b hashes next to the source file
+# (<list>.bin) and memory-mapped, so a lookup is a binary search and
+# loading costs nothing.
+#
+#   python strength.py passwords.txt --breached common-passwords.txt
+#   python strength.py passwords.txt --details > scores.ndjson
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import heapq
+import os
+import string
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:  # batches are scored one password at a time
+    np = None
+
+from engine import SYMBOLS
+
+UPPER, LOWER, DIGIT, SYMBOL, OTHER = 1, 2, 4, 8, 16
+# Characters outside the four classes (spaces, quotes, non-ASCII, ...)
+# count as one extra pool of this size
+OTHER_POOL = 32
+CLASS_POOLS = ((UPPER, 26), (LOWER, 26), (DIGIT, 10), (SYMBOL, len(SYMBOLS)), (OTHER, OTHER_POOL))
+
+# Entropy bands, in bits, for the labels the GUI shows
+WEAK_BELOW = 40
+STRONG_FROM = 60
+
+BATCH_SIZE = 10000
+BREACHED_MAGIC = b'PWHASH1\n'
+# Without NumPy, lists are compiled with an external sort: runs of this
+# many hashes are sorted in memory, spilled to disk and merged
+COMPILE_RUN_SIZE = 1 << 20
+COMPILE_READ_SIZE = 1 << 16
+
+CLASS_OF = {}
+for _chars, _bit in ((string.ascii_uppercase, UPPER), (string.ascii_lowercase, LOWER),
+                     (string.digits, DIGIT), (SYMBOLS, SYMBOL)):
+    CLASS_OF.update(dict.fromkeys(_chars, _bit))
+# Bits of entropy per character for every combination of class bits
+BITS_PER_CHAR = [math.log2(pool) if pool else 0.0
+                 for pool in (sum(size for bit, size in CLASS_POOLS if bits & bit)
+                              for bits in range(32))]
+
+if np is not None:
+    ASCII_CLASSES = np.array([CLASS_OF.get(chr(b), OTHER) for b in range(128)], dtype=np.uint8)
+    BITS_TABLE = np.array(BITS_PER_CHAR)
+
+
+def classify(password):
+    # One pass: the set is built in C, then each distinct character is
+    # looked up once
+    bits = 0
+    for c in set(password):
+        bits |= CLASS_OF.get(c, OTHER)
+    return bits
+
+
+def entropy(password):
+    return len(password) * BITS_PER_CHAR[classify(password)]
+
+
+def _entropies_numpy(passwords):
+    # ASCII passwords only. Every byte is classified through a lookup
+    # table and the class bits are OR-ed per password with reduceat.
+    encoded = [p.encode('ascii') for p in passwords]
+    lengths = np.fromiter(map(len, encoded), dtype=np.intp, count=len(encoded))
+    classes = ASCII_CLASSES[np.frombuffer(b''.join(encoded), dtype=np.uint8)]
+    bits = np.zeros(len(encoded), dtype=np.uint8)
+    nonempty = lengths > 0
+    starts = (np.cumsum(lengths) - lengths)[nonempty]
+    if len(starts):
+        bits[nonempty] = np.bitwise_or.reduceat(classes, starts)
+    return (lengths * BITS_TABLE[bits]).tolist()
+
+
+def password_hash(password):
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(password, digest_size=8).digest(), 'little')
+
+
+class BreachedList:
+    # Sorted uint64 hashes after an 8-byte magic, in native byte order.
+    # Hash collisions between 64-bit digests are rare enough to ignore.
+
+    def __init__(self, compiled_path):
+        self._file = open(compiled_path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(BREACHED_MAGIC)] != BREACHED_MAGIC:
+            self.close()
+            raise ValueError(f"{compiled_path} is not a compiled password list")
+        self.hashes = memoryview(self._map)[len(BREACHED_MAGIC):].cast('Q')
+        self.array = (np.frombuffer(self._map, dtype=np.uint64, offset=len(BREACHED_MAGIC))
+                      if np is not None else None)
+
+    @staticmethod
+    def _iter_run(f):
+        while True:
+            chunk = array('Q')
+            chunk.frombytes(f.read(COMPILE_READ_SIZE * chunk.itemsize))
+            if not chunk:
+                return
+            yield from chunk
+
+    @classmethod
+    def compile(cls, source_path, compiled_path):
+        # One password per line; lines are hashed as raw bytes. Hashes are
+        # collected 8 bytes apiece in a uint64 array and sorted with NumPy,
+        # or external-sorted in runs without it, so memory never holds a
+        # Python int per entry.
+        tmp_path = compiled_path + '.tmp'
+        with open(source_path, 'rb') as source, open(tmp_path, 'wb') as out:
+            out.write(BREACHED_MAGIC)
+            lines = (password_hash(line.rstrip(b'\r\n')) for line in source)
+            if np is not None:
+                hashes = array('Q', lines)
+                np.unique(np.frombuffer(hashes, dtype=np.uint64)).tofile(out)
+            else:
+                with tempfile.TemporaryDirectory() as run_dir:
+                    runs = []
+                    try:
+                        while True:
+                            run = array('Q', sorted(islice(lines, COMPILE_RUN_SIZE)))
+                            if not run:
+                                break
+                            runs.append(open(os.path.join(run_dir, f'{len(runs)}.run'), 'w+b'))
+                            run.tofile(runs[-1])
+                            runs[-1].seek(0)
+                        # Merge the runs, dropping repeats, and write in blocks
+                        block = array('Q')
+                        previous = None
+                        for value in heapq.merge(*(cls._iter_run(run) for run in runs)):
+                            if value != previous:
+                                block.append(value)
+                                previous = value
+                                if len(block) >= COMPILE_READ_SIZE:
+                                    block.tofile(out)
+                                    block = array('Q')
+                        block.tofile(out)
+                    finally:
+                        for run in runs:
+                            run.close()
+        os.replace(tmp_path, compiled_path)
+
+    @classmethod
+    def open(cls, path):
+        # Accepts a compiled list, or a text list that is compiled to
+        # <path>.bin on first use and again whenever the text changes
+        with open(path, 'rb') as f:
+            if f.read(len(BREACHED_MAGIC)) == BREACHED_MAGIC:
+                return cls(path)
+        compiled_path = path + '.bin'
+        if (not os.path.exists(compiled_path)
+                or os.path.getmtime(compiled_path) < os.path.getmtime(path)):
+            cls.compile(path, compiled_path)
+        return cls(compiled_path)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, password):
+        value = password_hash(password)
+        index = bisect_left(self.hashes, value)
+        return index < len(self.hashes) and self.hashes[index] == value
+
+    def contains_many(self, passwords):
+        if self.array is None or not len(self.array):
+            return [password in self for password in passwords]
+        values = np.fromiter(map(password_hash, passwords), dtype=np.uint64, count=len(passwords))
+        index = np.minimum(np.searchsorted(self.array, values), len(self.array) - 1)
+        return (self.array[index] == values).tolist()
+
+    def close(self):
+        self.array = None
+        if getattr(self, 'hashes', None) is not None:
+            self.hashes.release()
+            self.hashes = None
+        self._map.close()
+        self._file.close()
+
+
+class StrengthScorer:
+    def __init__(self, breached=None, weak_below=WEAK_BELOW, strong_from=STRONG_FROM):
+        self.breached = breached
+        self.weak_below = weak_below
+        self.strong_from = strong_from
+
+    def _label(self, bits, breached):
+        if breached or bits < self.weak_below:
+            return "Weak"
+        if bits < self.strong_from:
+            return "Medium"
+        return "Strong"
+
+    def score(self, password):
+        bits = entropy(password)
+        breached = self.breached is not None and password in self.breached
+        return {'entropy': round(bits, 1), 'label': self._label(bits, breached),
+                'breached': breached}
+
+    def label(self, password):
+        return self.score(password)['label']
+
+    def score_many(self, passwords):
+        # Same results as score() for each password; with NumPy the ASCII
+        # passwords are classified and looked up as whole arrays
+        passwords = list(passwords)
+        if np is not None:
+            ascii_indexes = [i for i, p in enumerate(passwords) if p.isascii()]
+            entropies = [None] * len(passwords)
+            for i, bits in zip(ascii_indexes,
+                               _entropies_numpy([passwords[i] for i in ascii_indexes])):
+                entropies[i] = bits
+            for i, bits in enumerate(entropies):
+                if bits is None:
+                    entropies[i] = entropy(passwords[i])
+        else:
+            entropies = [entropy(p) for p in passwords]
+
+        if self.breached is not None:
+            breached = self.breached.contains_many(passwords)
+        else:
+            breached = [False] * len(passwords)
+        return [{'entropy': round(bits, 1), 'label': self._label(bits, hit), 'breached': hit}
+                for bits, hit in zip(entropies, breached)]
+
+
+def iter_batches(stream, batch_size=BATCH_SIZE):
+    batch = []
+    for line in stream:
+        batch.append(line.rstrip('\r\n'))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audit the strength of a password list')
+    parser.add_argument('passwords', help="file with one password per line ('-' for stdin)")
+    parser.add_argument('--breached', help='common/breached password list (text or compiled)')
+    parser.add_argument('--details', action='store_true',
+                        help='print one JSON line per password (line, entropy, label, breached)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    scorer = StrengthScorer(BreachedList.open(args.breached) if args.breached else None)
+    if args.passwords == '-':
+        stream = sys.stdin
+    else:
+        stream = open(args.passwords, 'r', encoding='utf-8', errors='replace', newline='')
+
+    summary = {'total': 0, 'breached': 0, 'Weak': 0, 'Medium': 0, 'Strong': 0}
+    with stream:
+        for batch in iter_batches(stream, max(1, args.batch_size)):
+            for result in scorer.score_many(batch):
+                summary['total'] += 1
+                summary['breached'] += result['breached']
+                summary[result['label']] += 1
+                if args.details:
+                    print(json.dumps({'line': summary['total'], **result}))
+    print(json.dumps(summary), file=sys.stderr if args.details else sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
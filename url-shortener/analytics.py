@@ -0,0 +1,87 @@
+import atexit
+import threading
+import time
+
+HOUR = 3600
+DAY = 86400
+
+
+class ClickSeries:
+    # Per-code hourly and daily click counts. Redirects only bump an
+    # in-memory counter per (granularity, bucket, code); the counts are
+    # added to storage in one batch on every flush, so all workers read the
+    # same totals and they survive restarts. Reads see flushed clicks only.
+    # Buckets older than the hours/days windows are pruned as time moves on.
+
+    def __init__(self, storage, hours=168, days=90, clock=time.time):
+        self.storage = storage
+        self.sizes = {'hour': hours, 'day': days}
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = {}
+        self.pruned = {'hour': None, 'day': None}
+        atexit.register(self.flush)
+
+    def bucket(self, granularity, timestamp):
+        return int(timestamp) // (HOUR if granularity == 'hour' else DAY)
+
+    def record(self, code, count=1, timestamp=None):
+        timestamp = self.clock() if timestamp is None else timestamp
+        hour_key = ('hour', self.bucket('hour', timestamp), code)
+        day_key = ('day', self.bucket('day', timestamp), code)
+        with self.lock:
+            self.pending[hour_key] = self.pending.get(hour_key, 0) + count
+            self.pending[day_key] = self.pending.get(day_key, 0) + count
+
+    def forget(self, code):
+        # Stored buckets go with the code in storage.delete()
+        with self.lock:
+            for key in [key for key in self.pending if key[2] == code]:
+                del self.pending[key]
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                batch = self.pending
+                self.pending = {}
+            if not batch:
+                return 0
+            try:
+                self.storage.add_click_buckets(
+                    (granularity, bucket, code, count)
+                    for (granularity, bucket, code), count in batch.items())
+            except Exception:
+                # Put the counts back so the next flush retries them
+                with self.lock:
+                    for key, count in batch.items():
+                        self.pending[key] = self.pending.get(key, 0) + count
+                raise
+            self._prune()
+            return sum(count for key, count in batch.items() if key[0] == 'hour')
+
+    def _prune(self):
+        # At most one delete per granularity each time a bucket rolls over
+        now = self.clock()
+        for granularity, size in self.sizes.items():
+            oldest = self.bucket(granularity, now) - size + 1
+            if self.pruned[granularity] != oldest:
+                self.storage.prune_click_buckets(granularity, oldest)
+                self.pruned[granularity] = oldest
+
+    def _window(self, granularity, window):
+        window = max(1, min(window, self.sizes[granularity]))
+        last = self.bucket(granularity, self.clock())
+        return last - window + 1, last
+
+    def series(self, code, granularity='hour', window=24):
+        step = HOUR if granularity == 'hour' else DAY
+        first, last = self._window(granularity, window)
+        counts = self.storage.click_series(code, granularity, first, last)
+        return [{'start': b * step, 'clicks': counts.get(b, 0)} for b in range(first, last + 1)]
+
+    def top(self, n=10, granularity='hour', window=24):
+        # Summed by storage from the per-bucket totals, off the redirect path
+        first, last = self._window(granularity, window)
+        return [{'short_code': code, 'clicks': clicks}
+                for code, clicks in self.storage.top_codes(granularity, first, last, n)]
@@ -1,27 +1,75 @@
-from flask import Flask, request, jsonify, redirect
-import string
-import random
+from flask import Flask, Response, request, jsonify, redirect, stream_with_context
+from datetime import datetime
 import json
 import os
 
+from analytics import ClickSeries
+from cache import LRUCache
+from clicks import ClickCounter
+from codes import CodeAllocator
+from storage import create_storage, url_hash
+from streaming import iter_json_array, iter_ndjson
+
 app = Flask(__name__)
 
-# Simple file-based storage
-DATA_FILE = 'urls.json'
+# Pluggable storage: 'sqlite' (default) or the legacy 'json' file.
+# An existing urls.json is imported into SQLite on first start.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'sqlite')
+DB_FILE = os.environ.get('DB_FILE', 'urls.db')
+DATA_FILE = os.environ.get('DATA_FILE', 'urls.json')
+
+storage = create_storage(STORAGE_BACKEND, DB_FILE, DATA_FILE)
+
+# Clicks are buffered in memory and flushed in batches
+CLICK_FLUSH_SIZE = int(os.environ.get('CLICK_FLUSH_SIZE', 1000))
+CLICK_FLUSH_INTERVAL = float(os.environ.get('CLICK_FLUSH_INTERVAL', 5.0))
+
+# Resolution cache for hot short codes. A DELETE only invalidates the
+# cache of the worker that handled it, so CACHE_TTL bounds how long other
+# workers may keep redirecting a deleted code.
+CACHE_SIZE = int(os.environ.get('CACHE_SIZE', 10000))
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 60))
+
+url_cache = LRUCache(CACHE_SIZE, CACHE_TTL)
+
+# Hourly/daily click series, kept in storage and flushed with the clicks
+SERIES_HOURS = int(os.environ.get('SERIES_HOURS', 168))
+SERIES_DAYS = int(os.environ.get('SERIES_DAYS', 90))
 
-def load_urls():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+click_series = ClickSeries(storage, SERIES_HOURS, SERIES_DAYS)
 
-def save_urls(urls):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(urls, f)
+clicks = ClickCounter(storage, CLICK_FLUSH_SIZE, CLICK_FLUSH_INTERVAL,
+                      on_flush=lambda batch: click_series.flush())
+
+def lookup(short_code):
+    # Only the fields that never change are cached; click totals are read
+    # from storage by /stats, so a flush cannot leave a stale count behind
+    info = url_cache.get(short_code)
+    if info is None:
+        stored = storage.get(short_code)
+        if stored is not None:
+            info = {'original_url': stored['original_url'], 'created_at': stored['created_at']}
+            url_cache.put(short_code, info)
+    return info
+
+# Short codes come from a shared counter; each worker reserves a block
+# of IDs at a time. CODE_SCRAMBLE=1 makes consecutive codes non-sequential.
+CODE_BLOCK_SIZE = int(os.environ.get('CODE_BLOCK_SIZE', 1000))
+CODE_SCRAMBLE = os.environ.get('CODE_SCRAMBLE', '0') == '1'
+
+allocator = CodeAllocator(storage, CODE_BLOCK_SIZE, CODE_SCRAMBLE)
 
 def generate_short_code(length=6):
-    chars = string.ascii_letters + string.digits
-    return ''.join(random.choice(chars) for _ in range(length))
+    return allocator.next_code(length)
+
+# URLs per storage transaction in /shorten/batch
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 500))
+
+def normalize_input_url(url):
+    # Basic URL validation
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
 
 @app.route('/')
 def home():
@@ -29,8 +77,13 @@ def home():
         'message': 'URL Shortener API',
         'endpoints': {
             'POST /shorten': 'Shorten a URL',
+            'POST /shorten/batch': 'Shorten a JSON array or NDJSON stream of URLs',
             'GET /<short_code>': 'Redirect to original URL',
-            'GET /stats/<short_code>': 'Get URL statistics'
+            'GET /stats/<short_code>': 'Get URL statistics',
+            'GET /stats/<short_code>/series': 'Get hourly or daily click series',
+            'GET /stats/top': 'Get most clicked URLs in a time window',
+            'DELETE /<short_code>': 'Delete a short URL',
+            'GET /cache/stats': 'Get resolution cache statistics'
         }
     })
 
@@ -41,68 +94,173 @@ def shorten_url():
     if not data or 'url' not in data:
         return jsonify({'error': 'URL is required'}), 400
     
-    original_url = data['url']
-    
-    # Basic URL validation
-    if not original_url.startswith(('http://', 'https://')):
-        original_url = 'https://' + original_url
-    
-    urls = load_urls()
+    original_url = normalize_input_url(data['url'])
     
     # Check if URL already exists
-    for code, info in urls.items():
-        if info['original_url'] == original_url:
-            return jsonify({
-                'short_url': f'http://localhost:5000/{code}',
-                'original_url': original_url,
-                'short_code': code
-            })
-    
-    # Generate new short code
+    code = storage.find_code(original_url)
+    if code:
+        return jsonify({
+            'short_url': f'http://localhost:5000/{code}',
+            'original_url': original_url,
+            'short_code': code
+        })
+    
+    # Generate new short code. Allocated codes are unique; the loop only
+    # skips codes that clash with older random codes.
     short_code = generate_short_code()
-    while short_code in urls:
+    while not storage.add(short_code, original_url, str(datetime.now())):
         short_code = generate_short_code()
     
-    urls[short_code] = {
-        'original_url': original_url,
-        'clicks': 0,
-        'created_at': str(datetime.now()) if 'datetime' in globals() else 'N/A'
-    }
-    
-    save_urls(urls)
-    
     return jsonify({
         'short_url': f'http://localhost:5000/{short_code}',
         'original_url': original_url,
         'short_code': short_code
     })
 
+def shorten_chunk(chunk):
+    # chunk: list of (index, original_url); one lookup and one insert
+    # transaction for the whole chunk. URLs are matched by their normalized
+    # hash, as in /shorten, so a.com and https://A.com/ share one code.
+    keys = [url_hash(url) for _, url in chunk]
+    existing = storage.find_codes([url for _, url in chunk])
+    created_at = str(datetime.now())
+    new_codes = {}
+    new_urls = {}
+    rows = []
+    for key, (_, url) in zip(keys, chunk):
+        if key not in existing and key not in new_codes:
+            new_codes[key] = generate_short_code()
+            new_urls[key] = url
+            rows.append((new_codes[key], url, created_at))
+    
+    rejected = set(storage.add_batch(rows))
+    for key, code in new_codes.items():
+        if code in rejected:
+            # Clashed with an older random code
+            code = generate_short_code()
+            while not storage.add(code, new_urls[key], created_at):
+                code = generate_short_code()
+            new_codes[key] = code
+    
+    for key, (index, url) in zip(keys, chunk):
+        code = existing.get(key) or new_codes[key]
+        yield {
+            'index': index,
+            'short_url': f'http://localhost:5000/{code}',
+            'original_url': url,
+            'short_code': code
+        }
+
+@app.route('/shorten/batch', methods=['POST'])
+def shorten_batch():
+    # Accepts a JSON array or NDJSON (Content-Type: application/x-ndjson)
+    # of URLs or {"url": ...} objects and streams one NDJSON result per
+    # input line as chunks are committed.
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = iter_ndjson(request.stream)
+    else:
+        items = iter_json_array(request.stream)
+    
+    def generate():
+        chunk = []
+        error = None
+        try:
+            for index, item in enumerate(items):
+                url = item.get('url') if isinstance(item, dict) else item
+                if not isinstance(url, str) or not url:
+                    yield json.dumps({'index': index, 'error': 'URL is required'}) + '\n'
+                    continue
+                chunk.append((index, normalize_input_url(url)))
+                if len(chunk) >= BATCH_CHUNK_SIZE:
+                    for result in shorten_chunk(chunk):
+                        yield json.dumps(result) + '\n'
+                    chunk = []
+        except ValueError as e:
+            error = f'Invalid request body: {e}'
+        
+        for result in shorten_chunk(chunk):
+            yield json.dumps(result) + '\n'
+        if error:
+            yield json.dumps({'error': error}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/<short_code>')
 def redirect_url(short_code):
-    urls = load_urls()
+    info = lookup(short_code)
     
-    if short_code not in urls:
+    if info is None:
         return jsonify({'error': 'URL not found'}), 404
     
-    # Increment click count
-    urls[short_code]['clicks'] += 1
-    save_urls(urls)
+    # Increment click count (flushed to storage in batches). The series
+    # goes first so a flush triggered by increment() carries it too.
+    click_series.record(short_code)
+    clicks.increment(short_code)
     
-    return redirect(urls[short_code]['original_url'])
+    return redirect(info['original_url'])
+
+@app.route('/<short_code>', methods=['DELETE'])
+def delete_url(short_code):
+    if not storage.delete(short_code):
+        return jsonify({'error': 'URL not found'}), 404
+    clicks.discard(short_code)
+    click_series.forget(short_code)
+    url_cache.invalidate(short_code)
+    
+    return jsonify({'deleted': short_code})
 
 @app.route('/stats/<short_code>')
 def get_stats(short_code):
-    urls = load_urls()
+    info = storage.get(short_code)
     
-    if short_code not in urls:
+    if info is None:
         return jsonify({'error': 'URL not found'}), 404
     
     return jsonify({
         'short_code': short_code,
-        'original_url': urls[short_code]['original_url'],
-        'clicks': urls[short_code]['clicks'],
-        'created_at': urls[short_code].get('created_at', 'N/A')
+        'original_url': info['original_url'],
+        'clicks': info['clicks'] + clicks.pending_for(short_code),
+        'created_at': info.get('created_at') or 'N/A'
     })
 
+def series_params():
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in ('hour', 'day'):
+        return None, None
+    window = request.args.get('window', 24 if granularity == 'hour' else 30, type=int)
+    return granularity, window
+
+@app.route('/stats/<short_code>/series')
+def get_series(short_code):
+    if lookup(short_code) is None:
+        return jsonify({'error': 'URL not found'}), 404
+    
+    granularity, window = series_params()
+    if granularity is None:
+        return jsonify({'error': 'granularity must be hour or day'}), 400
+    
+    return jsonify({
+        'short_code': short_code,
+        'granularity': granularity,
+        'series': click_series.series(short_code, granularity, window)
+    })
+
+@app.route('/stats/top')
+def get_top():
+    granularity, window = series_params()
+    if granularity is None:
+        return jsonify({'error': 'granularity must be hour or day'}), 400
+    
+    n = request.args.get('n', 10, type=int)
+    return jsonify({
+        'granularity': granularity,
+        'window': window,
+        'top': click_series.top(n, granularity, window)
+    })
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(url_cache.stats())
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
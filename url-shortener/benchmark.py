@@ -0,0 +1,262 @@
+# Load and latency benchmark for the URL shortener.
+#
+# Runs offline against the Flask test client by default, or against a running
+# server with --url. Results are printed (or written with --output) as JSON so
+# runs can be compared.
+#
+#   python benchmark.py --sizes 1000,100000 --requests 20000 --concurrency 8
+#   python benchmark.py --url http://localhost:5000 --sizes 1000
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+SEED_CHUNK = 10000
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed):
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'throughput': round(len(values) / elapsed, 1) if elapsed else 0,
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0
+    }
+
+
+class TestClientTarget:
+    # Fresh app module per store size, backed by a store in a temp directory
+
+    def __init__(self, backend, workdir):
+        os.environ['STORAGE_BACKEND'] = backend
+        os.environ['DB_FILE'] = os.path.join(workdir, 'urls.db')
+        os.environ['DATA_FILE'] = os.path.join(workdir, 'urls.json')
+        sys.modules.pop('app', None)
+        self.app = importlib.import_module('app')
+        self.local = threading.local()
+
+    def seed(self, count):
+        storage = self.app.storage
+        created_at = str(datetime.now())
+        codes = []
+        for start in range(0, count, SEED_CHUNK):
+            rows = []
+            for i in range(start, min(count, start + SEED_CHUNK)):
+                code = self.app.generate_short_code()
+                rows.append((code, f'https://seed.example.com/{i}', created_at))
+                codes.append(code)
+            storage.add_batch(rows)
+        return codes
+
+    def _client(self):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.app.app.test_client()
+            self.local.client = client
+        return client
+
+    def shorten(self, url):
+        response = self._client().post('/shorten', json={'url': url})
+        return response.status_code
+
+    def redirect(self, code):
+        return self._client().get(f'/{code}').status_code
+
+    def stats(self, code):
+        return self._client().get(f'/stats/{code}').status_code
+
+    def close(self):
+        self.app.clicks.close()
+        self.app.storage.close()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ServerTarget:
+    # Running server; the store is seeded through /shorten/batch
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(_NoRedirect)
+
+    def _request(self, method, path, body=None, content_type='application/json'):
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if body is not None:
+            request.add_header('Content-Type', content_type)
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def seed(self, count):
+        run_id = random.getrandbits(32)
+        codes = []
+        for start in range(0, count, SEED_CHUNK):
+            lines = ''.join(
+                json.dumps({'url': f'https://seed.example.com/{run_id}/{i}'}) + '\n'
+                for i in range(start, min(count, start + SEED_CHUNK))
+            )
+            _, body = self._request('POST', '/shorten/batch', lines.encode(),
+                                    'application/x-ndjson')
+            for line in body.decode().splitlines():
+                result = json.loads(line)
+                if 'short_code' in result:
+                    codes.append(result['short_code'])
+        return codes
+
+    def shorten(self, url):
+        return self._request('POST', '/shorten', json.dumps({'url': url}).encode())[0]
+
+    def redirect(self, code):
+        return self._request('GET', f'/{code}')[0]
+
+    def stats(self, code):
+        return self._request('GET', f'/stats/{code}')[0]
+
+    def close(self):
+        pass
+
+
+def run_workload(target, codes, args):
+    mix = [(op, weight) for op, weight in args.mix.items() if weight > 0]
+    ops = [op for op, _ in mix]
+    weights = [weight for _, weight in mix]
+    hot_count = max(1, int(len(codes) * args.hot_fraction))
+    per_worker = args.requests // args.concurrency
+
+    def worker(worker_id):
+        rng = random.Random(args.seed + worker_id)
+        latencies = {op: [] for op in ops}
+        errors = 0
+        for i in range(per_worker):
+            op = rng.choices(ops, weights)[0]
+            if rng.random() < args.hot_traffic:
+                code = codes[rng.randrange(hot_count)]
+            else:
+                code = codes[rng.randrange(len(codes))]
+            start = time.perf_counter()
+            if op == 'shorten':
+                status = target.shorten(f'https://bench.example.com/{args.seed}/{worker_id}/{i}')
+            elif op == 'redirect':
+                status = target.redirect(code)
+            else:
+                status = target.stats(code)
+            latencies[op].append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(worker, range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    merged = {op: [] for op in ops}
+    errors = 0
+    for latencies, worker_errors in results:
+        errors += worker_errors
+        for op, values in latencies.items():
+            merged[op].extend(values)
+
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'errors': errors,
+        'total': summarize([v for values in merged.values() for v in values], elapsed),
+        'operations': {op: summarize(values, elapsed) for op, values in merged.items()}
+    }
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        op, weight = part.split('=')
+        if op not in ('shorten', 'redirect', 'stats'):
+            raise argparse.ArgumentTypeError(f'Unknown operation: {op}')
+        mix[op] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='URL shortener load benchmark')
+    parser.add_argument('--sizes', default='1000,100000,1000000',
+                        help='comma-separated store sizes to seed')
+    parser.add_argument('--requests', type=int, default=10000,
+                        help='requests per store size')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--mix', type=parse_mix,
+                        default=parse_mix('shorten=0.1,redirect=0.8,stats=0.1'),
+                        help='operation weights, e.g. shorten=0.1,redirect=0.8,stats=0.1')
+    parser.add_argument('--hot-fraction', type=float, default=0.01,
+                        help='fraction of codes that receive the hot traffic')
+    parser.add_argument('--hot-traffic', type=float, default=0.8,
+                        help='share of reads that go to the hot codes')
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'json'])
+    parser.add_argument('--url', help='benchmark a running server instead of the test client')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON results to this file')
+    args = parser.parse_args()
+    args.concurrency = max(1, args.concurrency)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    report = {
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'mix': args.mix,
+            'hot_fraction': args.hot_fraction,
+            'hot_traffic': args.hot_traffic,
+            'backend': 'server' if args.url else args.backend,
+            'url': args.url,
+            'seed': args.seed
+        },
+        'results': []
+    }
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as workdir:
+            target = ServerTarget(args.url) if args.url else TestClientTarget(args.backend, workdir)
+            try:
+                start = time.perf_counter()
+                codes = target.seed(size)
+                seed_time = time.perf_counter() - start
+                result = run_workload(target, codes, args)
+            finally:
+                target.close()
+        result = {'store_size': size, 'seed_s': round(seed_time, 3), **result}
+        report['results'].append(result)
+        print(f"size={size} throughput={result['total']['throughput']}/s "
+              f"p99={result['total']['p99_ms']}ms", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ClickCounter:
+    # Write-behind click counting. Redirects only bump an in-memory counter;
+    # the counts are written to storage in one batch once max_pending clicks
+    # have piled up, every flush_interval seconds, and at shutdown.
+    # Each worker process keeps its own counters.
+
+    def __init__(self, storage, max_pending=1000, flush_interval=5.0, on_flush=None):
+        self.storage = storage
+        self.on_flush = on_flush
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = {}
+        self.pending_total = 0
+        self.stopped = threading.Event()
+
+        if flush_interval > 0:
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        # A failed flush keeps its counts pending; the next tick retries
+        while not self.stopped.wait(self.flush_interval):
+            self._try_flush()
+
+    def _try_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing click counts failed; will retry')
+
+    def increment(self, code, count=1):
+        with self.lock:
+            self.pending[code] = self.pending.get(code, 0) + count
+            self.pending_total += count
+            should_flush = self.pending_total >= self.max_pending
+        if should_flush:
+            # Best effort: the redirect has already been served
+            self._try_flush()
+
+    def pending_for(self, code):
+        with self.lock:
+            return self.pending.get(code, 0)
+
+    def discard(self, code):
+        with self.lock:
+            self.pending_total -= self.pending.pop(code, 0)
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                batch = self.pending
+                self.pending = {}
+                self.pending_total = 0
+            try:
+                self.storage.add_clicks_many(batch)
+            except Exception:
+                # Put the counts back so the next flush retries them
+                with self.lock:
+                    for code, count in batch.items():
+                        self.pending[code] = self.pending.get(code, 0) + count
+                        self.pending_total += count
+                raise
+            if self.on_flush:
+                self.on_flush(batch)
+            return sum(batch.values())
+
+    def close(self):
+        self.stopped.set()
+        self.flush()
@@ -0,0 +1,60 @@
+import string
+import threading
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+
+# Multiplier for scrambling; coprime to 62 so the mapping is a bijection
+# on every 62**length code space.
+SCRAMBLE_MULTIPLIER = 0x5DEECE66D
+
+
+def encode_base62(number, length=0):
+    digits = []
+    while number:
+        number, rem = divmod(number, BASE)
+        digits.append(ALPHABET[rem])
+    code = ''.join(reversed(digits)) or ALPHABET[0]
+    return code.rjust(length, ALPHABET[0])
+
+
+def decode_base62(code):
+    number = 0
+    for char in code:
+        number = number * BASE + ALPHABET.index(char)
+    return number
+
+
+class CodeAllocator:
+    # Counter-based short codes. Every process reserves a block of IDs from
+    # the shared sequence in storage and then hands out codes from that
+    # block locally, so workers never collide and never retry.
+    # IDs that no longer fit in `length` characters spill into longer codes.
+
+    def __init__(self, storage, block_size=1000, scramble=False):
+        self.storage = storage
+        self.block_size = block_size
+        self.scramble = scramble
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.end_id = 0
+
+    def _next_id(self):
+        with self.lock:
+            if self.next_id >= self.end_id:
+                self.next_id = self.storage.reserve_ids(self.block_size)
+                self.end_id = self.next_id + self.block_size
+            value = self.next_id
+            self.next_id += 1
+            return value
+
+    def to_code(self, number, length=6):
+        space = BASE ** length
+        if number < space:
+            if self.scramble:
+                number = (number * SCRAMBLE_MULTIPLIER + space // 3) % space
+            return encode_base62(number, length)
+        return encode_base62(number)
+
+    def next_code(self, length=6):
+        return self.to_code(self._next_id(), length)
@@ -0,0 +1,465 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_url(url):
+    # Scheme and host are case-insensitive; a bare host and host + '/'
+    # point at the same resource.
+    parts = urlsplit(url.strip())
+    path = parts.path or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path,
+                       parts.query, parts.fragment))
+
+
+def url_hash(url):
+    return hashlib.blake2b(normalize_url(url).encode('utf-8'), digest_size=16).digest()
+
+
+class JSONStorage:
+    # Legacy single-file store, kept for small setups and tests.
+    # The whole file is held in memory and rewritten on every change,
+    # so it is only safe with a single worker process.
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.urls = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.urls = json.load(f)
+        # Short code sequence lives next to the data file
+        self.seq_path = path + '.seq'
+        self.next_id = 1
+        if os.path.exists(self.seq_path):
+            with open(self.seq_path, 'r') as f:
+                self.next_id = int(f.read().strip() or 1)
+        # Reverse index: normalized URL hash -> short code
+        self.by_url = {}
+        for code, info in self.urls.items():
+            self.by_url.setdefault(url_hash(info['original_url']), code)
+        # Click series: {granularity: {bucket: {code: clicks}}}, in a sidecar file
+        self.series_path = path + '.series'
+        self.buckets = {'hour': {}, 'day': {}}
+        if os.path.exists(self.series_path):
+            with open(self.series_path, 'r') as f:
+                for granularity, buckets in json.load(f).items():
+                    self.buckets[granularity] = {int(b): codes for b, codes in buckets.items()}
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.urls, f)
+        os.replace(tmp_path, self.path)
+
+    def _save_series(self):
+        tmp_path = self.series_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.buckets, f)
+        os.replace(tmp_path, self.series_path)
+
+    def get(self, code):
+        with self.lock:
+            info = self.urls.get(code)
+            return dict(info) if info else None
+
+    def find_code(self, original_url):
+        with self.lock:
+            return self.by_url.get(url_hash(original_url))
+
+    def find_codes(self, original_urls):
+        # Returns {url_hash: code}, so URLs that normalize alike share one entry
+        with self.lock:
+            found = {}
+            for url in original_urls:
+                key = url_hash(url)
+                code = self.by_url.get(key)
+                if code:
+                    found[key] = code
+            return found
+
+    def add(self, code, original_url, created_at):
+        with self.lock:
+            if code in self.urls:
+                return False
+            self.urls[code] = {
+                'original_url': original_url,
+                'clicks': 0,
+                'created_at': created_at
+            }
+            self.by_url.setdefault(url_hash(original_url), code)
+            self._save()
+            return True
+
+    def add_batch(self, rows):
+        # rows: list of (code, original_url, created_at); returns the codes
+        # that were already taken
+        rejected = []
+        with self.lock:
+            for code, original_url, created_at in rows:
+                if code in self.urls:
+                    rejected.append(code)
+                    continue
+                self.urls[code] = {
+                    'original_url': original_url,
+                    'clicks': 0,
+                    'created_at': created_at
+                }
+                self.by_url.setdefault(url_hash(original_url), code)
+            self._save()
+        return rejected
+
+    def delete(self, code):
+        with self.lock:
+            info = self.urls.pop(code, None)
+            if info is None:
+                return False
+            key = url_hash(info['original_url'])
+            if self.by_url.get(key) == code:
+                del self.by_url[key]
+                # Fall back to another code for the same URL, if any
+                for other, other_info in self.urls.items():
+                    if url_hash(other_info['original_url']) == key:
+                        self.by_url[key] = other
+                        break
+            self._save()
+            removed = False
+            for buckets in self.buckets.values():
+                for codes in buckets.values():
+                    removed = codes.pop(code, None) is not None or removed
+            if removed:
+                self._save_series()
+            return True
+
+    def add_clicks(self, code, count=1):
+        with self.lock:
+            if code not in self.urls:
+                return False
+            self.urls[code]['clicks'] += count
+            self._save()
+            return True
+
+    def add_clicks_many(self, counts):
+        with self.lock:
+            for code, count in counts.items():
+                if code in self.urls:
+                    self.urls[code]['clicks'] += count
+            self._save()
+
+    def add_click_buckets(self, rows):
+        # rows: iterable of (granularity, bucket, code, clicks); clicks for
+        # codes deleted in the meantime are dropped
+        with self.lock:
+            for granularity, bucket, code, clicks in rows:
+                if code not in self.urls:
+                    continue
+                codes = self.buckets[granularity].setdefault(bucket, {})
+                codes[code] = codes.get(code, 0) + clicks
+            self._save_series()
+
+    def prune_click_buckets(self, granularity, oldest):
+        with self.lock:
+            buckets = self.buckets[granularity]
+            stale = [b for b in buckets if b < oldest]
+            for b in stale:
+                del buckets[b]
+            if stale:
+                self._save_series()
+
+    def click_series(self, code, granularity, first, last):
+        with self.lock:
+            buckets = self.buckets[granularity]
+            return {b: buckets[b][code] for b in range(first, last + 1)
+                    if b in buckets and code in buckets[b]}
+
+    def top_codes(self, granularity, first, last, n):
+        with self.lock:
+            totals = {}
+            for b in range(first, last + 1):
+                for code, clicks in self.buckets[granularity].get(b, {}).items():
+                    totals[code] = totals.get(code, 0) + clicks
+        best = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+        return best[:n]
+
+    def reserve_ids(self, count):
+        with self.lock:
+            start = self.next_id
+            self.next_id += count
+            with open(self.seq_path, 'w') as f:
+                f.write(str(self.next_id))
+            return start
+
+    def count(self):
+        with self.lock:
+            return len(self.urls)
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage:
+    # Keyed on-disk store. WAL mode lets readers run alongside a writer and
+    # busy_timeout makes concurrent writers from other workers wait instead
+    # of failing. Each thread gets its own connection.
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS urls ('
+                ' code TEXT PRIMARY KEY,'
+                ' original_url TEXT NOT NULL,'
+                ' clicks INTEGER NOT NULL DEFAULT 0,'
+                ' created_at TEXT,'
+                ' url_hash BLOB'
+                ')'
+            )
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(urls)')]
+            if 'url_hash' not in columns:
+                conn.execute('ALTER TABLE urls ADD COLUMN url_hash BLOB')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_urls_hash ON urls (url_hash)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sequences ('
+                ' name TEXT PRIMARY KEY,'
+                ' next_id INTEGER NOT NULL'
+                ')'
+            )
+            # Click series, one row per (granularity, bucket, code)
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS click_buckets ('
+                ' granularity TEXT NOT NULL,'
+                ' bucket INTEGER NOT NULL,'
+                ' code TEXT NOT NULL,'
+                ' clicks INTEGER NOT NULL,'
+                ' PRIMARY KEY (granularity, bucket, code)'
+                ') WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_click_buckets_code'
+                         ' ON click_buckets (code, granularity, bucket)')
+        self._backfill_hashes()
+
+    def _backfill_hashes(self):
+        # Rows written before the reverse index existed have no hash yet
+        conn = self._conn()
+        while True:
+            rows = conn.execute(
+                'SELECT code, original_url FROM urls WHERE url_hash IS NULL LIMIT 10000'
+            ).fetchall()
+            if not rows:
+                break
+            with conn:
+                conn.executemany(
+                    'UPDATE urls SET url_hash = ? WHERE code = ?',
+                    [(url_hash(url), code) for code, url in rows]
+                )
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA busy_timeout=30000')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def get(self, code):
+        row = self._conn().execute(
+            'SELECT original_url, clicks, created_at FROM urls WHERE code = ?',
+            (code,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'original_url': row[0], 'clicks': row[1], 'created_at': row[2]}
+
+    def find_code(self, original_url):
+        row = self._conn().execute(
+            'SELECT code FROM urls WHERE url_hash = ? LIMIT 1',
+            (url_hash(original_url),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def find_codes(self, original_urls):
+        # Returns {url_hash: code}, so URLs that normalize alike share one entry
+        conn = self._conn()
+        hashes = list({url_hash(url) for url in original_urls})
+        found = {}
+        # Stay below SQLite's bound-parameter limit
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT url_hash, code FROM urls WHERE url_hash IN ({placeholders})',
+                chunk
+            )
+            for key, code in rows:
+                found.setdefault(key, code)
+        return found
+
+    def add(self, code, original_url, created_at):
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO urls (code, original_url, clicks, created_at, url_hash)'
+                    ' VALUES (?, ?, 0, ?, ?)',
+                    (code, original_url, created_at, url_hash(original_url))
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def add_many(self, rows):
+        # rows: iterable of (code, original_url, clicks, created_at)
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO urls (code, original_url, clicks, created_at, url_hash)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                ((code, url, clicks, created_at, url_hash(url))
+                 for code, url, clicks, created_at in rows)
+            )
+
+    def add_batch(self, rows):
+        # rows: list of (code, original_url, created_at), inserted in one
+        # transaction; returns the codes that were already taken
+        rejected = []
+        conn = self._conn()
+        with conn:
+            for code, original_url, created_at in rows:
+                cur = conn.execute(
+                    'INSERT OR IGNORE INTO urls (code, original_url, clicks, created_at, url_hash)'
+                    ' VALUES (?, ?, 0, ?, ?)',
+                    (code, original_url, created_at, url_hash(original_url))
+                )
+                if cur.rowcount == 0:
+                    rejected.append(code)
+        return rejected
+
+    def delete(self, code):
+        conn = self._conn()
+        with conn:
+            cur = conn.execute('DELETE FROM urls WHERE code = ?', (code,))
+            conn.execute('DELETE FROM click_buckets WHERE code = ?', (code,))
+        return cur.rowcount > 0
+
+    def add_clicks(self, code, count=1):
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                'UPDATE urls SET clicks = clicks + ? WHERE code = ?',
+                (count, code)
+            )
+        return cur.rowcount > 0
+
+    def add_clicks_many(self, counts):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                'UPDATE urls SET clicks = clicks + ? WHERE code = ?',
+                ((count, code) for code, count in counts.items())
+            )
+
+    def add_click_buckets(self, rows):
+        # rows: iterable of (granularity, bucket, code, clicks); one
+        # transaction per flush, adding to whatever other workers wrote.
+        # Codes another worker deleted (but may still have cached) are
+        # skipped, so their buckets do not come back after delete().
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                'INSERT INTO click_buckets (granularity, bucket, code, clicks)'
+                ' SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM urls WHERE code = ?)'
+                ' ON CONFLICT (granularity, bucket, code)'
+                ' DO UPDATE SET clicks = clicks + excluded.clicks',
+                ((granularity, bucket, code, clicks, code)
+                 for granularity, bucket, code, clicks in rows)
+            )
+
+    def prune_click_buckets(self, granularity, oldest):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM click_buckets WHERE granularity = ? AND bucket < ?',
+                         (granularity, oldest))
+
+    def click_series(self, code, granularity, first, last):
+        rows = self._conn().execute(
+            'SELECT bucket, clicks FROM click_buckets'
+            ' WHERE code = ? AND granularity = ? AND bucket BETWEEN ? AND ?',
+            (code, granularity, first, last)
+        )
+        return dict(rows)
+
+    def top_codes(self, granularity, first, last, n):
+        return self._conn().execute(
+            'SELECT code, SUM(clicks) AS total FROM click_buckets'
+            ' WHERE granularity = ? AND bucket BETWEEN ? AND ?'
+            ' GROUP BY code ORDER BY total DESC, code LIMIT ?',
+            (granularity, first, last, n)
+        ).fetchall()
+
+    def reserve_ids(self, count, name='codes'):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers
+        # can never read the same next_id.
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT next_id FROM sequences WHERE name = ?', (name,)
+            ).fetchone()
+            start = row[0] if row else 1
+            conn.execute(
+                'INSERT OR REPLACE INTO sequences (name, next_id) VALUES (?, ?)',
+                (name, start + count)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return start
+
+    def count(self):
+        return self._conn().execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+
+    def close(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+def migrate_json(storage, json_path):
+    # One-shot import of a legacy urls.json. The file is renamed afterwards
+    # so the import never runs twice.
+    if not os.path.exists(json_path) or storage.count() > 0:
+        return 0
+
+    with open(json_path, 'r') as f:
+        urls = json.load(f)
+
+    storage.add_many(
+        (code, info['original_url'], info.get('clicks', 0), info.get('created_at', 'N/A'))
+        for code, info in urls.items()
+    )
+    # Another worker may have finished the same import first; INSERT OR
+    # IGNORE keeps that harmless, only the rename can race.
+    try:
+        os.replace(json_path, json_path + '.migrated')
+    except FileNotFoundError:
+        pass
+    return len(urls)
+
+
+def create_storage(backend, db_file, json_file):
+    if backend == 'json':
+        return JSONStorage(json_file)
+    if backend == 'sqlite':
+        storage = SQLiteStorage(db_file)
+        migrate_json(storage, json_file)
+        return storage
+    raise ValueError(f'Unknown storage backend: {backend}')
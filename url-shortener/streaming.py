@@ -0,0 +1,74 @@
+import io
+import json
+
+READ_SIZE = 64 * 1024
+
+
+def iter_ndjson(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8')
+    for line in text:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_json_array(stream):
+    # Yields the elements of a top-level JSON array as they are read, so the
+    # whole body never has to be in memory at once.
+    text = io.TextIOWrapper(stream, encoding='utf-8')
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = text.read(READ_SIZE)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if pos >= len(buf) or buf[pos] != '[':
+        raise ValueError('Expected a JSON array')
+    pos += 1
+
+    first = True
+    while True:
+        skip_whitespace()
+        if pos >= len(buf):
+            raise ValueError('Unterminated JSON array')
+        if buf[pos] == ']':
+            return
+        if not first:
+            if buf[pos] != ',':
+                raise ValueError('Expected , between array elements')
+            pos += 1
+            skip_whitespace()
+        first = False
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A number at the end of the buffer may continue in the next read
+            if end == len(buf) and not eof:
+                fill()
+                continue
+            pos = end
+            break
+        yield value